@@ -1,13 +1,68 @@
-from threading import Lock
-from typing import Dict, Any
-from time import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, Any, FrozenSet, Optional
 
-CACHE_LOCK = Lock()
+import httpx
 
-GLOBAL_CACHE: Dict[str, Any] = {
-    "snapshot": None,
-    "detail": {},
-    "updated_at": None,
-    "status": "warming_up",  # warming_up | ready | error
-}
+from server.data_sources.naver_finance import StockDetail, fetch_stock_detail
 
+
+@dataclass(frozen=True)
+class CacheSnapshot:
+    """
+    Immutable view of the cache published by `cache_loop`.
+    The writer builds a new instance and rebinds `STATE` in one assignment
+    (atomic under the GIL), so readers grab `cache.STATE` once without locking.
+    """
+    snapshot: Optional[dict] = None
+    detail: Dict[str, Any] = field(default_factory=dict)
+    # code -> snapshot signature the detail was fetched for (incremental refresh)
+    signatures: Dict[str, tuple] = field(default_factory=dict)
+    # code -> monotonic() the detail was fetched (per-code TTL)
+    fetched_at: Dict[str, float] = field(default_factory=dict)
+    # codes whose refetch failed this cycle; the previous detail is served instead
+    stale_details: FrozenSet[str] = frozenset()
+    updated_at: Optional[float] = None  # wall clock, for display only
+    updated_at_mono: Optional[float] = None  # monotonic, for freshness checks
+    status: str = "warming_up"  # warming_up | ready
+    # orjson bytes encoded once per cycle; handlers return them as-is
+    snapshot_json: Optional[bytes] = None
+    detail_json: Dict[str, bytes] = field(default_factory=dict)
+    # (ts, repr(e)) of the last failed cycle; last-good data keeps being served
+    last_error: Optional[tuple] = None
+
+
+STATE = CacheSnapshot()
+
+
+# 진행 중인 종목 상세 조회 (code -> Future). 같은 종목 동시 요청은 1회만 조회
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+async def get_or_fetch(code: str, client: httpx.AsyncClient) -> Optional[StockDetail]:
+    """
+    Single-flight wrapper around `fetch_stock_detail`.
+    Concurrent callers for the same code await the first caller's result
+    instead of issuing duplicate upstream requests. The lookup and insert
+    below have no await in between, so they are atomic on the event loop.
+    """
+    fut = _inflight.get(code)
+    if fut is not None:
+        return await asyncio.shield(fut)
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[code] = fut
+    try:
+        result = await fetch_stock_detail(client, code)
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except BaseException as e:
+        fut.set_exception(e)
+        fut.exception()  # mark retrieved when nobody else was waiting
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        _inflight.pop(code, None)
@@ -1,68 +1,246 @@
 import os
 import asyncio
-import traceback
+import logging
+import queue
+import random
 import httpx
-from time import time
-from server.cache import GLOBAL_CACHE, CACHE_LOCK
-from server.data_sources.naver_finance import (
-    build_snapshot,
-    fetch_stock_detail,
-)
+import orjson
+from datetime import datetime, time as dtime, timedelta, timezone
+from time import monotonic, perf_counter, time
+from typing import Optional
+from dataclasses import replace
+from logging.handlers import QueueHandler, QueueListener
+from server import cache
+from server.cache import CacheSnapshot, get_or_fetch
+from server.data_sources.naver_finance import build_snapshot, stock_detail_payload
 
 CACHE_INTERVAL = int(os.getenv("CACHE_INTERVAL", "60"))
+CACHE_CONCURRENCY = int(os.getenv("CACHE_CONCURRENCY", "8"))
+DETAIL_TTL = int(os.getenv("DETAIL_TTL", "120"))
+JITTER = 0.2  # ±20% per-code TTL spread
+DETAIL_TIMEOUT = float(os.getenv("DETAIL_TIMEOUT", "8"))  # seconds per code (all pages)
 MAX_BACKOFF = 300  # seconds
+MAX_IDLE_INTERVAL = 600  # seconds, cap while the snapshot stays unchanged
+OFF_HOURS_FACTOR = 30  # CACHE_INTERVAL multiplier while KRX is closed
+UNCHANGED_CYCLES = 3  # identical snapshots before the interval starts doubling
+
+# KRX 정규장 (KST, 서머타임 없음)
+KST = timezone(timedelta(hours=9))
+MARKET_OPEN = dtime(9, 0)
+MARKET_CLOSE = dtime(15, 30)
+
+log = logging.getLogger("cache")
+_log_listener: Optional[QueueListener] = None
+
+# 🔹 사이클 간 재사용되는 공유 AsyncClient (keep-alive / TLS 세션 유지)
+CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global CLIENT
+    if CLIENT is None or CLIENT.is_closed:
+        # 단일 호스트(finance.naver.com)이므로 HTTP/2 멀티플렉싱 + 풀 크기 명시
+        from server.data_sources.naver_finance import UA
+        CLIENT = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_keepalive_connections=32,
+                max_connections=64,
+                keepalive_expiry=60.0,
+            ),
+            headers={
+                "User-Agent": UA,
+                "Accept-Language": "ko-KR,ko;q=0.9",
+                # HTML 응답 압축 (br은 httpx[brotli] 설치 시 자동 해제)
+                "Accept-Encoding": "br, gzip",
+            },
+            timeout=httpx.Timeout(connect=5.0, read=10.0, write=5.0, pool=5.0),
+        )
+    return CLIENT
+
+
+async def close_client():
+    global CLIENT
+    if CLIENT is not None:
+        await CLIENT.aclose()
+        CLIENT = None
+
+
+def start_logging():
+    """cache 로그는 큐에만 넣고 실제 stdout 쓰기는 리스너 스레드가 담당 (이벤트 루프 비차단)"""
+    global _log_listener
+    if _log_listener is not None:
+        return
+    q = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("[CACHE] %(levelname)s %(message)s"))
+    _log_listener = QueueListener(q, handler)
+    _log_listener.start()
+    log.addHandler(QueueHandler(q))
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+
+def stop_logging():
+    """남은 로그를 모두 flush 하고 리스너 스레드 종료"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    now = now or datetime.now(KST)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() <= MARKET_CLOSE
+
+
+def _seconds_until_open(now: datetime) -> float:
+    day = now
+    if now.time() > MARKET_CLOSE:
+        day = now + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    opens = datetime.combine(day.date(), MARKET_OPEN, tzinfo=KST)
+    return max(0.0, (opens - now).total_seconds())
+
+
+def _next_sleep(interval: float) -> float:
+    """장중에는 적응형 interval, 장 마감 후에는 길게 (다음 개장 시각은 넘기지 않음)"""
+    now = datetime.now(KST)
+    if is_market_open(now):
+        return interval
+    return max(CACHE_INTERVAL, min(CACHE_INTERVAL * OFF_HOURS_FACTOR, _seconds_until_open(now)))
+
+
+def _detail_signature(stock: dict) -> tuple:
+    """Snapshot fields that invalidate a cached detail when they change."""
+    return (stock.get("price"), stock.get("change"))
+
 
 async def cache_loop():
+    start_logging()
     backoff = 1
+    interval = CACHE_INTERVAL
+    last_digest = None
+    unchanged = 0
+    # 🔹 상세 조회 동시 실행 수 제한 (Naver 부하 방지)
+    sem = asyncio.Semaphore(CACHE_CONCURRENCY)
 
     while True:
         try:
-            print("[CACHE] update started")
-
-            # 🔹 AsyncClient 1회 생성 (재사용)
-            from server.data_sources.naver_finance import UA
-            async with httpx.AsyncClient(
-                headers={"User-Agent": UA, "Accept-Language": "ko-KR,ko;q=0.9"},
-                timeout=15.0
-            ) as client:
-                new_snapshot = await build_snapshot(client)
-
-                new_detail = {}
-                for stock in new_snapshot.get("stocks", []):
-                    code = stock.get("code")
-                    if not code:
+            log.info("update started")
+            t0 = perf_counter()
+
+            client = get_client()
+            new_snapshot = await build_snapshot(client)
+
+            # 🔹 가격 변화가 없고 종목별 TTL(±지터) 이내인 detail만 재사용
+            # 가격이 바뀌었거나 TTL이 지난 종목은 재조회 (지터로 만료 시점 분산 → 동시 폭주 완화)
+            prev = cache.STATE
+            now = monotonic()
+            new_detail = {}
+            new_signatures = {}
+            new_fetched_at = {}
+            codes = []
+            for stock in new_snapshot.get("stocks", []):
+                code = stock.get("code")
+                if not code:
+                    continue
+                if code in prev.detail:
+                    age = now - prev.fetched_at.get(code, 0.0)
+                    ttl = DETAIL_TTL * (1 + random.uniform(-JITTER, JITTER))
+                    if prev.signatures.get(code) == _detail_signature(stock) and age <= ttl:
+                        new_detail[code] = prev.detail[code]
+                        new_signatures[code] = prev.signatures.get(code)
+                        new_fetched_at[code] = prev.fetched_at.get(code, 0.0)
                         continue
+                new_signatures[code] = _detail_signature(stock)
+                codes.append(code)
+            reused = len(new_detail)
+
+            async def bounded(code):
+                # 세마포어 대기 시간은 제외하고 종목별 전체 조회 시간만 제한
+                async with sem:
+                    return code, await asyncio.wait_for(get_or_fetch(code, client), DETAIL_TIMEOUT)
 
-                    try:
-                        detail = await fetch_stock_detail(client, code)
-                        if detail:
-                            new_detail[code] = detail
-                    except (
-                        httpx.ReadTimeout,
-                        httpx.ConnectTimeout,
-                        httpx.HTTPError,
-                    ) as e:
-                        print(f"[CACHE WARN] detail failed: {code} ({e})")
+            # 🔹 상세 정보 병렬 조회 (연결 풀 공유)
+            results = await asyncio.gather(
+                *(bounded(code) for code in codes),
+                return_exceptions=True,
+            )
+
+            stale_details = set()
+            for code, result in zip(codes, results):
+                if isinstance(result, asyncio.TimeoutError):
+                    log.warning("detail timed out: %s (>%ss)", code, DETAIL_TIMEOUT)
+                elif isinstance(result, BaseException):
+                    log.warning("detail failed: %s (%s)", code, result)
+                else:
+                    _, detail = result
+                    if detail:
+                        new_detail[code] = detail
+                        new_fetched_at[code] = now
                         continue
+                # 🔹 stale-if-error: 재조회 실패 시 이전 정상 detail 유지 (다음 사이클에 재시도)
+                if code in prev.detail:
+                    new_detail[code] = prev.detail[code]
+                    new_signatures[code] = prev.signatures.get(code)
+                    new_fetched_at[code] = prev.fetched_at.get(code, 0.0)
+                    stale_details.add(code)
+                else:
+                    new_signatures.pop(code, None)
+
+            # 🔹 응답 본문을 사이클당 1회만 직렬화
+            snapshot_json = orjson.dumps(new_snapshot)
+            detail_json = {
+                code: orjson.dumps(stock_detail_payload(detail, new_snapshot))
+                for code, detail in new_detail.items()
+            }
 
-            # 🔹 swap (atomic)
-            with CACHE_LOCK:
-                GLOBAL_CACHE["snapshot"] = new_snapshot
-                GLOBAL_CACHE["detail"] = new_detail
-                GLOBAL_CACHE["updated_at"] = time()
-                GLOBAL_CACHE["status"] = "ready"
+            # 🔹 swap (atomic) - 단일 writer, 참조 재바인딩만으로 교체
+            cache.STATE = CacheSnapshot(
+                snapshot=new_snapshot,
+                detail=new_detail,
+                snapshot_json=snapshot_json,
+                detail_json=detail_json,
+                signatures=new_signatures,
+                fetched_at=new_fetched_at,
+                stale_details=frozenset(stale_details),
+                updated_at=time(),
+                updated_at_mono=monotonic(),
+                status="ready",
+            )
 
-            print(f"[CACHE] update completed ({len(new_detail)} stocks)")
+            elapsed_ms = (perf_counter() - t0) * 1000
+            log.info(
+                "update completed (%d stocks, %d reused, %d stale, %.0fms)",
+                len(new_detail), reused, len(stale_details), elapsed_ms,
+            )
             backoff = 1
-            await asyncio.sleep(CACHE_INTERVAL)
+
+            # 🔹 적응형 주기: 스냅샷이 연속으로 같으면 간격 2배 (상한 MAX_IDLE_INTERVAL)
+            digest = hash(snapshot_json)
+            if digest == last_digest:
+                unchanged += 1
+                if unchanged >= UNCHANGED_CYCLES:
+                    interval = min(interval * 2, MAX_IDLE_INTERVAL)
+            else:
+                unchanged = 0
+                interval = CACHE_INTERVAL
+            last_digest = digest
+
+            await asyncio.sleep(_next_sleep(interval))
 
         except Exception as e:
-            print("[CACHE ERROR]", e)
-            traceback.print_exc()
+            log.exception("update failed: %s", e)
 
-            with CACHE_LOCK:
-                GLOBAL_CACHE["status"] = "error"
+            # 🔹 stale-if-error: 이전 정상 데이터는 유지하고 에러만 기록
+            prev = cache.STATE
+            cache.STATE = replace(
+                prev,
+                status="ready" if prev.snapshot is not None else "warming_up",
+                last_error=(time(), repr(e)),
+            )
 
             await asyncio.sleep(backoff)
             backoff = min(backoff * 2, MAX_BACKOFF)
-
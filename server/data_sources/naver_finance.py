@@ -1,22 +1,66 @@
 from __future__ import annotations
 
+import asyncio
+import bisect
+import functools
+import heapq
+import logging
+import os
 import re
 from collections import Counter
 from dataclasses import dataclass
+from operator import itemgetter
+from time import monotonic
 from typing import List, Optional
 
 import httpx
-from bs4 import BeautifulSoup
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree
+from lxml import html as lxml_html
 
 
+# 종목별 진행 로그는 debug (기본 레벨에서는 포맷팅 자체를 건너뜀), 실패만 warning 이상
+log = logging.getLogger("naver_finance")
+
 UA = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
     "AppleWebKit/537.36 (KHTML, like Gecko) "
     "Chrome/120.0.0.0 Safari/537.36"
 )
 
+# Precompiled patterns (numeric cells, item links, detail-page parsing loops)
+_FLOAT_RE = re.compile(r"[-+]?\d[\d,]*(?:\.\d+)?")  # "+29.98" -> "+29.98"
+_CODE_RE = re.compile(r"code=(\d+)")  # item link href -> stock code
+_PERIOD_RE = re.compile(r"(\d{4})\.(\d{1,2})")  # "2024.09" -> (year, month)
+_KOSDAQ_RE = re.compile(r"코스닥|kosdaq", re.IGNORECASE)  # no html.lower() copy
+_DATE_RE = re.compile(r"\d{4}[\.-]\d{1,2}[\.-]\d{1,2}")  # YYYY.MM.DD / YYYY-MM-DD
+_INVESTOR_KEYWORD_RE = re.compile("외국인|기관|순매매|매매동향|투자자")  # investor table summary/caption
+_HEADER_SKIP = frozenset(("날짜", "일자", "구분", "Date"))  # header text repeated in investor rows
+
+
+def _css_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Compiled XPath for the rising-stock table (evaluated in C, no CSS translation per row)
+_RISE_TABLE_XPATH = etree.XPath(f"//table[{_css_class('type_2')}]")
+_THEAD_XPATH = etree.XPath(".//thead")
+_TH_XPATH = etree.XPath(".//th")
+_TD_XPATH = etree.XPath(".//td")
+_TLTLE_XPATH = etree.XPath(f".//a[{_css_class('tltle')}]")
+# sise_index.naver 지수 페이지
+_NOW_VALUE_XPATH = etree.XPath("//em[@id='now_value']")
+_FLUC_XPATH = etree.XPath("//*[@id='change_value_and_rate']")
+_QUOTIENT_XPATH = etree.XPath("//div[@id='quotient']")
+
+
+def _text(el, sep: str = "") -> str:
+    """lxml equivalent of bs4 `get_text(sep, strip=True)`."""
+    return sep.join(t for t in (s.strip() for s in el.itertext()) if t)
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class IndexQuote:
     name: str
     value: float
@@ -24,7 +68,7 @@ class IndexQuote:
     change_pct: float
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class RisingStock:
     code: str
     name: str
@@ -36,7 +80,16 @@ class RisingStock:
     market: str  # "KOSPI" | "KOSDAQ"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class InvestorTrend:
+    date: str  # YYYY.MM.DD
+    institution: int  # 기관 순매매량
+    foreigner: int  # 외국인 순매매량
+    foreigner_shares: int  # 외국인 보유주수
+    foreigner_ratio: float  # 외국인 보유율 (%)
+
+
+@dataclass(slots=True)
 class StockDetail:
     code: str
     name: str
@@ -61,7 +114,34 @@ class StockDetail:
     # Financial summary - date-keyed dictionary structure
     financials: Optional[dict] = None  # {"2024.12": {"sales": float, "operating_profit": float}, ...}
     # Investor trends
-    investor_trends: Optional[List[dict]] = None  # [{"date": str, "institution": int, "foreigner": int, "foreigner_shares": int, "foreigner_ratio": float}]
+    investor_trends: Optional[List[InvestorTrend]] = None  # 최신순, orjson이 dataclass를 그대로 객체로 직렬화
+
+
+_EMPTY_CELLS = frozenset(("", "-", "N/A"))
+# str.translate table dropping C0 control characters except \t \n \r
+_CTRL_CHARS = {c: None for c in range(32) if c not in (9, 10, 13)}
+
+
+def _scan_number(s: str, frac: bool) -> Optional[str]:
+    """
+    Return the first `[-+]?digits[,digits](.digits)?` token of s with commas
+    and the '+' sign dropped, or None. Single pass, no regex / match objects.
+    """
+    n = len(s)
+    i = 0
+    while i < n and not ("0" <= s[i] <= "9"):
+        i += 1
+    if i == n:
+        return None
+    start = i - 1 if i and s[i - 1] == "-" else i
+    i += 1
+    while i < n and ("0" <= s[i] <= "9" or s[i] == ","):
+        i += 1
+    if frac and i + 1 < n and s[i] == "." and "0" <= s[i + 1] <= "9":
+        i += 2
+        while i < n and "0" <= s[i] <= "9":
+            i += 1
+    return s[start:i].replace(",", "")
 
 
 def _to_int(s: str) -> int:
@@ -73,12 +153,16 @@ def _to_int(s: str) -> int:
       '-' / 'N/A' -> 0
     """
     s = (s or "").strip()
-    if s in ("", "-", "N/A"):
+    if s in _EMPTY_CELLS:
         return 0
-    m = re.search(r"[-+]?\d[\d,]*", s)
-    if not m:
-        return 0
-    return int(m.group(0).replace(",", "").replace("+", ""))
+    # Fast path: plain table cell such as '3,520', then signed '+1,234' / '-120'
+    t = s.replace(",", "")
+    if t.isdecimal():
+        return int(t)
+    if s[0] in "+-" and s[1:2].isdecimal() and t[1:].isdecimal():
+        return int(t)
+    tok = _scan_number(s, frac=False)
+    return int(tok) if tok else 0
 
 
 def _to_float(s: str) -> float:
@@ -89,31 +173,62 @@ def _to_float(s: str) -> float:
       '전일비 1,234' -> 1234.0
     """
     s = (s or "").strip()
-    if s in ("", "-", "N/A"):
-        return 0.0
-    s = s.replace("%", "")
-    m = re.search(r"[-+]?\d[\d,]*(?:\.\d+)?", s)
-    if not m:
+    if s in _EMPTY_CELLS:
         return 0.0
-    return float(m.group(0).replace(",", "").replace("+", ""))
+    # Fast path: whole cell is one number such as '+29.98' / '1,234.5' (no scan)
+    body = s[1:] if s[0] in "+-" else s
+    if body[:1].isdecimal():
+        t = body.replace(",", "")
+        if t.replace(".", "", 1).isdecimal() and "," not in body.partition(".")[2]:
+            return -float(t) if s[0] == "-" else float(t)
+    tok = _scan_number(s, frac=True)
+    return float(tok) if tok else 0.0
 
 
-async def _get(client: httpx.AsyncClient, url: str) -> str:
-    r = await client.get(url, follow_redirects=True, timeout=15.0)
+async def _get(client: httpx.AsyncClient, url: str, timeout=httpx.USE_CLIENT_DEFAULT) -> str:
+    # timeout은 기본적으로 클라이언트 설정(get_client의 httpx.Timeout)을 따름, 필요한 호출만 override
+    r = await client.get(url, follow_redirects=True, timeout=timeout)
     r.raise_for_status()
-    # Try to detect encoding, fallback to euc-kr
-    if r.encoding is None or r.encoding.lower() in ('iso-8859-1', 'windows-1252'):
-        r.encoding = "euc-kr"  # Naver finance commonly uses EUC-KR
-    # Ensure proper encoding for Korean text
+    # Decode once with the declared charset; Naver finance commonly uses EUC-KR
+    encoding = r.charset_encoding
+    if encoding is None or encoding.lower() in ("iso-8859-1", "windows-1252"):
+        encoding = "euc-kr"
     try:
-        text = r.text
-        # Verify encoding by trying to encode/decode
-        text.encode('utf-8')
-        return text
-    except (UnicodeEncodeError, UnicodeDecodeError):
-        # If encoding fails, try to fix it
-        r.encoding = "euc-kr"
-        return r.text
+        return r.content.decode(encoding, errors="replace")
+    except LookupError:  # unknown charset label
+        return r.content.decode("euc-kr", errors="replace")
+
+
+def _parse_index_html(html: str, code: str) -> Optional[IndexQuote]:
+    """Parse one sise_index.naver page into an IndexQuote (None if the value is missing)."""
+    doc = lxml_html.fromstring(html)
+    now_el = next(iter(_NOW_VALUE_XPATH(doc)), None)
+    fluc_el = next(iter(_FLUC_XPATH(doc)), None)
+    quo_el = next(iter(_QUOTIENT_XPATH(doc)), None)
+
+    if now_el is None:
+        return None
+    now = _to_float(_text(now_el))
+
+    fluc_txt = _text(fluc_el, " ") if fluc_el is not None else ""
+    # Example:
+    #  - "13.76 +0.34% 전일대비"
+    #  - "9.19 -0.99% 전일대비"
+    nums = _FLOAT_RE.findall(fluc_txt.replace("%", ""))
+    ch = float(nums[0].replace(",", "").replace("+", "")) if len(nums) >= 1 else 0.0
+    pct = float(nums[1].replace(",", "").replace("+", "")) if len(nums) >= 2 else 0.0
+
+    # Determine sign via quotient class if available (KOSDAQ uses 'dn')
+    cls = quo_el.get("class", "").split() if quo_el is not None else []
+    if "dn" in cls or "down" in cls:
+        ch = -abs(ch)
+        pct = -abs(pct)
+    elif "up" in cls:
+        ch = abs(ch)
+        pct = abs(pct)
+    # else: keep sign from parsed string
+
+    return IndexQuote(code, now, ch, pct)
 
 
 async def fetch_index_quotes(client: httpx.AsyncClient) -> List[IndexQuote]:
@@ -124,43 +239,42 @@ async def fetch_index_quotes(client: httpx.AsyncClient) -> List[IndexQuote]:
     async def fetch_one(code: str) -> Optional[IndexQuote]:
         try:
             html = await _get(client, f"https://finance.naver.com/sise/sise_index.naver?code={code}")
-            soup = BeautifulSoup(html, "html.parser")
-            now_el = soup.select_one("em#now_value")
-            fluc_el = soup.select_one("#change_value_and_rate")
-            quo_el = soup.select_one("div#quotient")
-
-            if not now_el:
-                return None
-            now = _to_float(now_el.get_text(strip=True))
-
-            fluc_txt = fluc_el.get_text(" ", strip=True) if fluc_el else ""
-            # Example:
-            #  - "13.76 +0.34% 전일대비"
-            #  - "9.19 -0.99% 전일대비"
-            nums = re.findall(r"[-+]?\d[\d,]*(?:\.\d+)?", fluc_txt.replace("%", ""))
-            ch = float(nums[0].replace(",", "").replace("+", "")) if len(nums) >= 1 else 0.0
-            pct = float(nums[1].replace(",", "").replace("+", "")) if len(nums) >= 2 else 0.0
-
-            # Determine sign via quotient class if available (KOSDAQ uses 'dn')
-            cls = quo_el.get("class", []) if quo_el else []
-            if "dn" in cls or "down" in cls:
-                ch = -abs(ch)
-                pct = -abs(pct)
-            elif "up" in cls:
-                ch = abs(ch)
-                pct = abs(pct)
-            # else: keep sign from parsed string
-
-            return IndexQuote(code, now, ch, pct)
+            # 파싱은 스레드 풀에서 → KOSPI/KOSDAQ 파싱이 이벤트 루프를 막지 않음
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, _parse_index_html, html, code)
         except Exception:
             return None
 
-    out: List[IndexQuote] = []
-    for code in ("KOSPI", "KOSDAQ"):
-        q = await fetch_one(code)
-        if q:
-            out.append(q)
-    return out
+    results = await asyncio.gather(fetch_one("KOSPI"), fetch_one("KOSDAQ"))
+    return [q for q in results if q]
+
+
+# 헤더 텍스트 → 컬럼 키 (위에서부터 처음 일치하는 항목 사용)
+_HEADER_SUBSTR_TO_KEY = (
+    (("종목명", "종목"), "name"),
+    (("현재가", "종가"), "price"),
+    (("전일비", "등락"), "change"),
+    (("등락률", "%"), "change_pct"),
+    (("거래량",), "volume"),
+    (("거래대금",), "trade_value"),
+)
+# 헤더 구성은 요청마다 거의 같으므로 헤더 튜플 단위로 결과 재사용
+_HEADER_CACHE: dict = {}
+
+
+def _header_map(header_texts: tuple) -> dict:
+    cached = _HEADER_CACHE.get(header_texts)
+    if cached is not None:
+        return cached
+    header_map = {}
+    for i, header_text in enumerate(header_texts):
+        for substrs, key in _HEADER_SUBSTR_TO_KEY:
+            if any(sub in header_text for sub in substrs):
+                header_map[key] = i
+                break
+    if len(_HEADER_CACHE) < 32:  # bound the cache if the layout keeps changing
+        _HEADER_CACHE[header_texts] = header_map
+    return header_map
 
 
 async def fetch_rising_stocks(client: httpx.AsyncClient, market: str, limit: int = 50) -> List[RisingStock]:
@@ -170,43 +284,49 @@ async def fetch_rising_stocks(client: httpx.AsyncClient, market: str, limit: int
     """
     sosok = "0" if market.upper() == "KOSPI" else "1"
     html = await _get(client, f"https://finance.naver.com/sise/sise_rise.naver?sosok={sosok}")
-    soup = BeautifulSoup(html, "html.parser")
-    table = soup.select_one("table.type_2")
-    if not table:
+    # 상승 종목 표 파싱도 CPU 작업 → 워커 스레드에서 실행 (KOSPI/KOSDAQ 파싱이 루프를 막지 않음)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _parse_rising_html, html, market, limit)
+
+
+def _parse_rising_html(html: str, market: str, limit: int) -> List[RisingStock]:
+    """Parse the sise_rise.naver table into at most `limit` RisingStock rows."""
+    try:
+        doc = lxml_html.fromstring(html)
+    except etree.ParserError:  # 빈 응답 (Document is empty) → 테이블 없음과 동일하게 처리
+        return []
+    tables = _RISE_TABLE_XPATH(doc)
+    if not tables:
         return []
+    table = tables[0]
 
     # 헤더에서 컬럼 인덱스 찾기
-    thead = table.select_one("thead")
+    theads = _THEAD_XPATH(table)
     header_map = {}
-    if thead:
-        headers = thead.select("th")
-        for i, th in enumerate(headers):
-            header_text = th.get_text(strip=True)
-            if "종목명" in header_text or "종목" in header_text:
-                header_map["name"] = i
-            elif "현재가" in header_text or "종가" in header_text:
-                header_map["price"] = i
-            elif "전일비" in header_text or "등락" in header_text:
-                header_map["change"] = i
-            elif "등락률" in header_text or "%" in header_text:
-                header_map["change_pct"] = i
-            elif "거래량" in header_text:
-                header_map["volume"] = i
-            elif "거래대금" in header_text:
-                header_map["trade_value"] = i
+    if theads:
+        header_map = _header_map(tuple(_text(th) for th in _TH_XPATH(theads[0])))
     
-    rows = table.select("tr")
+    # 헤더 매칭으로 정확한 컬럼 찾기, 없으면 기본 인덱스 사용
+    price_idx = header_map.get("price", 2)
+    change_idx = header_map.get("change", 3)
+    change_pct_idx = header_map.get("change_pct", 4)
+    volume_idx = header_map.get("volume", 5)
+    trade_value_idx = header_map.get("trade_value", 8)
+
+    # 종목 링크(a.tltle)에서 출발해 상위 tr로 올라감 → 빈/구분 행은 아예 순회하지 않음
     out: List[RisingStock] = []
-    for tr in rows:
-        tds = tr.find_all("td")
+    last_tr = None
+    for a in _TLTLE_XPATH(table):
+        tr = next(a.iterancestors("tr"), None)
+        if tr is None or tr is last_tr:
+            continue  # 행당 첫 번째 링크만 사용
+        last_tr = tr
+        tds = _TD_XPATH(tr)
         if len(tds) < 5:
             continue
-        a = tr.select_one("a.tltle")
-        if not a:
-            continue
-        name = a.get_text(strip=True)
+        name = _text(a)
         href = a.get("href", "")
-        m = re.search(r"code=(\d+)", href)
+        m = _CODE_RE.search(href)
         if not m:
             continue
         code = m.group(1)
@@ -216,19 +336,14 @@ async def fetch_rising_stocks(client: httpx.AsyncClient, market: str, limit: int
         if any(keyword in name_upper for keyword in ["ETN", "ETF", "스펙", "스팩", "SPAC"]):
             continue
 
-        # 헤더 매칭으로 정확한 컬럼 찾기, 없으면 기본 인덱스 사용
-        price_idx = header_map.get("price", 2)
-        change_idx = header_map.get("change", 3)
-        change_pct_idx = header_map.get("change_pct", 4)
-        volume_idx = header_map.get("volume", 5)
-        trade_value_idx = header_map.get("trade_value", 8)
-        
-        price = _to_int(tds[price_idx].get_text(" ", strip=True)) if price_idx < len(tds) else 0
-        change = _to_int(tds[change_idx].get_text(" ", strip=True)) if change_idx < len(tds) else 0
-        change_pct = _to_float(tds[change_pct_idx].get_text(" ", strip=True)) if change_pct_idx < len(tds) else 0.0
-        volume = _to_int(tds[volume_idx].get_text(" ", strip=True)) if volume_idx < len(tds) else 0
+        # 사용하는 5개 셀만 텍스트 추출 (lxml text_content는 C 레벨, 공백은 _to_int/_to_float에서 처리)
+        n = len(tds)
+        price = _to_int(tds[price_idx].text_content()) if price_idx < n else 0
+        change = _to_int(tds[change_idx].text_content()) if change_idx < n else 0
+        change_pct = _to_float(tds[change_pct_idx].text_content()) if change_pct_idx < n else 0.0
+        volume = _to_int(tds[volume_idx].text_content()) if volume_idx < n else 0
         # 거래대금은 백만원 단위로 표시되므로 원 단위로 변환
-        trade_value_raw = tds[trade_value_idx].get_text(" ", strip=True) if trade_value_idx < len(tds) else "0"
+        trade_value_raw = tds[trade_value_idx].text_content() if trade_value_idx < n else "0"
         trade_value = _to_int(trade_value_raw) * 1_000_000  # 백만원 → 원
 
         out.append(
@@ -248,6 +363,13 @@ async def fetch_rising_stocks(client: httpx.AsyncClient, market: str, limit: int
     return out
 
 
+# calculate_score 구간 보너스: 임계값(오름차순, 이상) → bisect 인덱스로 보너스 조회
+_TRADE_VALUE_STEPS = (100000, 200000, 500000)  # 10억 / 20억 / 50억 이상
+_TRADE_VALUE_BONUS = (0, 5, 10, 20)
+_VOLUME_STEPS = (10000000, 20000000, 50000000)  # 1천만 / 2천만 / 5천만주 이상
+_VOLUME_BONUS = (0, 3, 8, 15)
+
+
 def calculate_score(stock: RisingStock) -> int:
     """
     Calculate stock score based on multiple factors.
@@ -259,73 +381,78 @@ def calculate_score(stock: RisingStock) -> int:
     - Volume (participation)
     - Market (KOSPI vs KOSDAQ)
     """
-    base_score = stock.change_pct * 5  # Base: 5 points per 1% change
-    
-    # Trade value bonus (higher liquidity = higher score)
-    if stock.trade_value >= 500000:  # 50억 이상
-        base_score += 20
-    elif stock.trade_value >= 200000:  # 20억 이상
-        base_score += 10
-    elif stock.trade_value >= 100000:  # 10억 이상
-        base_score += 5
-    
-    # Volume bonus (high participation)
-    if stock.volume >= 50000000:  # 5천만주 이상
-        base_score += 15
-    elif stock.volume >= 20000000:  # 2천만주 이상
-        base_score += 8
-    elif stock.volume >= 10000000:  # 1천만주 이상
-        base_score += 3
-    
-    # Market bonus (KOSDAQ tends to be more volatile)
-    if stock.market == "KOSDAQ":
-        base_score += 2
-    
-    # Limit-up bonus
-    if stock.change_pct >= 29.8:
-        base_score += 10
-    
+    base_score = (
+        stock.change_pct * 5  # Base: 5 points per 1% change
+        # Trade value bonus (higher liquidity = higher score)
+        + _TRADE_VALUE_BONUS[bisect.bisect_right(_TRADE_VALUE_STEPS, stock.trade_value)]
+        # Volume bonus (high participation)
+        + _VOLUME_BONUS[bisect.bisect_right(_VOLUME_STEPS, stock.volume)]
+        # Market bonus (KOSDAQ tends to be more volatile)
+        + (2 if stock.market == "KOSDAQ" else 0)
+        # Limit-up bonus
+        + (10 if stock.change_pct >= 29.8 else 0)
+    )
     # Cap at 150 (as seen in original)
     return int(min(150, max(0, round(base_score))))
 
 
+# Common theme keywords in Korean stock market
+_THEME_KEYWORDS = {
+    "반도체": ["반도체", "칩", "웨이퍼", "실리콘"],
+    "배터리": ["배터리", "전지", "리튬", "에너지"],
+    "바이오": ["바이오", "제약", "의료", "바이오텍", "제약바이오"],
+    "AI": ["AI", "인공지능", "머신러닝", "딥러닝"],
+    "전기차": ["전기차", "전기", "EV", "전동차"],
+    "2차전지": ["2차전지", "이차전지", "배터리"],
+    "게임": ["게임", "엔터테인먼트"],
+    "증권": ["증권", "투자", "금융"],
+    "건설": ["건설", "시공", "토목"],
+    "화학": ["화학", "석유화학"],
+    "철강": ["철강", "제철"],
+    "IT": ["IT", "소프트웨어", "시스템"],
+}
+
+
+def _build_theme_matcher():
+    """
+    One regex pass per name instead of theme x keyword `in` scans.
+    The lookahead finds the longest keyword at every position (overlaps included);
+    each keyword maps to every theme having a keyword contained in it
+    ("이차전지" -> 2차전지 + 배터리 via "전지").
+    """
+    keywords = sorted({kw for kws in _THEME_KEYWORDS.values() for kw in kws}, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, keywords)) + "))")
+    themes_for = {
+        kw: frozenset(t for t, kws in _THEME_KEYWORDS.items() if any(k in kw for k in kws))
+        for kw in keywords
+    }
+    return pattern, themes_for
+
+
+_THEME_RE, _THEMES_FOR_KEYWORD = _build_theme_matcher()
+
+
 def detect_themes(stocks: List[RisingStock]) -> List[dict]:
     """
     Detect leading themes from stock names and group by common keywords.
     This is a heuristic approach - will be refined based on original EXE logic.
     """
-    from collections import Counter
-    
-    # Common theme keywords in Korean stock market
-    theme_keywords = {
-        "반도체": ["반도체", "칩", "웨이퍼", "실리콘"],
-        "배터리": ["배터리", "전지", "리튬", "에너지"],
-        "바이오": ["바이오", "제약", "의료", "바이오텍", "제약바이오"],
-        "AI": ["AI", "인공지능", "머신러닝", "딥러닝"],
-        "전기차": ["전기차", "전기", "EV", "전동차"],
-        "2차전지": ["2차전지", "이차전지", "배터리"],
-        "게임": ["게임", "엔터테인먼트"],
-        "증권": ["증권", "투자", "금융"],
-        "건설": ["건설", "시공", "토목"],
-        "화학": ["화학", "석유화학"],
-        "철강": ["철강", "제철"],
-        "IT": ["IT", "소프트웨어", "시스템"],
-    }
-    
     # Count theme occurrences in top stocks
     theme_counts: Counter[str] = Counter()
     theme_stocks: dict[str, List[RisingStock]] = {}
     
     for stock in stocks:
         name = stock.name
-        matched_themes = []
+        found = set()
+        for kw in _THEME_RE.findall(name):
+            found |= _THEMES_FOR_KEYWORD[kw]
+        # 테마 순서는 _THEME_KEYWORDS 정의 순서 유지 (대부분의 종목명은 매칭 없음 → 순회 생략)
+        matched_themes = [theme for theme in _THEME_KEYWORDS if theme in found] if found else ()
         
-        for theme, keywords in theme_keywords.items():
-            if any(kw in name for kw in keywords):
-                matched_themes.append(theme)
-                if theme not in theme_stocks:
-                    theme_stocks[theme] = []
-                theme_stocks[theme].append(stock)
+        for theme in matched_themes:
+            if theme not in theme_stocks:
+                theme_stocks[theme] = []
+            theme_stocks[theme].append(stock)
         
         # If no theme matched, check for common suffixes
         if not matched_themes:
@@ -358,6 +485,44 @@ def detect_themes(stocks: List[RisingStock]) -> List[dict]:
     ]
 
 
+def _build_signal_templates() -> dict:
+    """
+    All signals_for outputs keyed by (change band, band-specific flag, volume surge).
+    Only the stop-loss price varies per stock; it stays a `{stop_loss:,}` placeholder.
+    Entries are shared across stocks; signals_for returns copies, never these dicts.
+    """
+    breakout_hot = {"title": "⚡ 돌파 매매 (손절 {stop_loss:,}원)", "desc": "급등, 거래대금 폭발", "tone": "warn"}
+    breakout = {"title": "⚡ 돌파 매매 (손절 {stop_loss:,}원)", "desc": "급등, 모멘텀 수급", "tone": "warn"}
+    watch_flat = {"title": "👀 고가 놀이 (수급 확인)", "desc": "보합세, 수급 확인 필요", "tone": "neutral"}
+    bands = {
+        # Limit-up detection (상한가)
+        ("limit_up", True): [{"title": "🔒 상한가 홀딩 / 매수 금지", "desc": "상한가", "tone": "bad"}, breakout_hot],
+        ("limit_up", False): [{"title": "🔒 상한가 홀딩 / 매수 금지", "desc": "상한가", "tone": "bad"}, breakout],
+        # Strong breakout (20%+ but not limit-up)
+        ("breakout", True): [breakout_hot],
+        ("breakout", False): [breakout],
+        # Pullback entry opportunity (12%+)
+        ("pullback", False): [{"title": "🧲 눌림목 매수 (분할 진입)", "desc": "강세, 거래대금 확인", "tone": "ok"}],
+        # Moderate strength (5-12%) - profit-taking when volume piles up at the high
+        ("moderate", True): [{"title": "💰 차익 실현 매물 출회(관망)", "desc": "고가대 거래량 증가, 조정 가능성", "tone": "neutral"}],
+        ("moderate", False): [{"title": "👀 고가 놀이 (수급 확인)", "desc": "강세, 변동성 유의", "tone": "neutral"}],
+        # Stable uptrend (0-5%)
+        ("uptrend", True): [{"title": "📊 추세 추종", "desc": "안정적 상승 추세, 지속 모니터링", "tone": "ok"}],
+        ("uptrend", False): [watch_flat],
+        # Negative or flat
+        ("flat", False): [watch_flat],
+    }
+    surge = {"title": "📈 거래량 급증", "desc": "수급 변동성 확대", "tone": "neutral"}
+    table = {}
+    for (band, flag), sigs in bands.items():
+        table[(band, flag, False)] = tuple(sigs[:6])
+        table[(band, flag, True)] = tuple((sigs + [surge])[:6])
+    return table
+
+
+_SIGNAL_TEMPLATES = _build_signal_templates()
+
+
 def signals_for(s: RisingStock) -> list[dict]:
     """
     Generate trading signals based on stock performance.
@@ -372,54 +537,113 @@ def signals_for(s: RisingStock) -> list[dict]:
     6. 💰 차익 실현 매물 출회(관망) - 고가대 거래량 증가, 조정 가능성
     7. 📈 거래량 급증 - 거래량 폭증 신호
     """
-    sigs: list[dict] = []
-    
-    # Limit-up detection (상한가)
     if s.change_pct >= 29.8:
-        sigs.append({"title": "🔒 상한가 홀딩 / 매수 금지", "desc": "상한가", "tone": "bad"})
-        # Calculate stop-loss (7% below current price for limit-up)
-        stop_loss = int(s.price * 0.93)
-        if s.trade_value >= 200000:  # 20억 이상 = 거래대금 폭발
-            sigs.append({"title": f"⚡ 돌파 매매 (손절 {stop_loss:,}원)", "desc": "급등, 거래대금 폭발", "tone": "warn"})
-        else:
-            sigs.append({"title": f"⚡ 돌파 매매 (손절 {stop_loss:,}원)", "desc": "급등, 모멘텀 수급", "tone": "warn"})
-    
-    # Strong breakout (20%+ but not limit-up)
+        band, flag = "limit_up", s.trade_value >= 200000  # 20억 이상 = 거래대금 폭발
+        stop_loss = int(s.price * 0.93)  # 7% below current price for limit-up
     elif s.change_pct >= 20:
+        band, flag = "breakout", s.trade_value >= 200000
         stop_loss = int(s.price * 0.95)  # 5% stop-loss for strong moves
-        if s.trade_value >= 200000:  # 20억 이상
-            sigs.append({"title": f"⚡ 돌파 매매 (손절 {stop_loss:,}원)", "desc": "급등, 거래대금 폭발", "tone": "warn"})
-        else:
-            sigs.append({"title": f"⚡ 돌파 매매 (손절 {stop_loss:,}원)", "desc": "급등, 모멘텀 수급", "tone": "warn"})
-    
-    # Pullback entry opportunity (12%+)
     elif s.change_pct >= 12:
-        sigs.append({"title": "🧲 눌림목 매수 (분할 진입)", "desc": "강세, 거래대금 확인", "tone": "ok"})
-    
-    # Moderate strength (5-12%)
+        band, flag, stop_loss = "pullback", False, None
     elif s.change_pct >= 5:
-        # Check for profit-taking signals (high volume at high price)
-        if s.volume >= 15000000 and s.trade_value >= 150000:  # 고가대 거래량 증가
-            sigs.append({"title": "💰 차익 실현 매물 출회(관망)", "desc": "고가대 거래량 증가, 조정 가능성", "tone": "neutral"})
-        else:
-            sigs.append({"title": "👀 고가 놀이 (수급 확인)", "desc": "강세, 변동성 유의", "tone": "neutral"})
-    
-    # Stable uptrend (0-5%)
+        band, flag, stop_loss = "moderate", s.volume >= 15000000 and s.trade_value >= 150000, None
     elif s.change_pct > 0:
-        if s.volume >= 10000000 and s.trade_value >= 100000:  # 안정적 상승 추세
-            sigs.append({"title": "📊 추세 추종", "desc": "안정적 상승 추세, 지속 모니터링", "tone": "ok"})
-        else:
-            sigs.append({"title": "👀 고가 놀이 (수급 확인)", "desc": "보합세, 수급 확인 필요", "tone": "neutral"})
-    
-    # Negative or flat
+        band, flag, stop_loss = "uptrend", s.volume >= 10000000 and s.trade_value >= 100000, None
     else:
-        sigs.append({"title": "👀 고가 놀이 (수급 확인)", "desc": "보합세, 수급 확인 필요", "tone": "neutral"})
+        band, flag, stop_loss = "flat", False, None
 
     # Volume surge indicator (applies to all cases)
-    if s.volume >= 20000000:  # 2천만주 이상
-        sigs.append({"title": "📈 거래량 급증", "desc": "수급 변동성 확대", "tone": "neutral"})
-    
-    return sigs[:6]
+    templates = _SIGNAL_TEMPLATES[(band, flag, s.volume >= 20000000)]
+    # 템플릿은 모듈 공용 → 호출자가 수정해도 다른 응답에 번지지 않도록 항상 복사본 반환
+    if stop_loss is None:
+        return [dict(t) for t in templates]
+    return [
+        {**t, "title": t["title"].format(stop_loss=stop_loss)} if "{stop_loss" in t["title"] else dict(t)
+        for t in templates
+    ]
+
+
+def _keyword_matcher(keywords: List[str]) -> tuple:
+    """
+    (pattern, covers) for counting distinct keywords in one regex pass.
+    The lookahead reports the longest keyword at every position (overlaps included),
+    covers[kw] is every keyword contained in kw.
+    """
+    kws = sorted(set(keywords), key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, kws)) + "))")
+    covers = {kw: frozenset(k for k in kws if k in kw) for kw in kws}
+    return pattern, covers
+
+
+def _count_keywords(matcher: tuple, text: str) -> int:
+    """Number of distinct keywords of `matcher` that occur in text."""
+    pattern, covers = matcher
+    found = set()
+    for kw in pattern.findall(text):
+        found |= covers[kw]
+    return len(found)
+
+
+# 긍정적 키워드
+_POSITIVE_NEWS = _keyword_matcher([
+    "인기 검색", "검색 종목", "급등", "상한가", "구조대", "왔다", "상승", "호재",
+    "실적", "수주", "계약", "승인", "인허가", "신약", "개발", "성공", "돌파",
+])
+# 부정적 키워드
+_NEGATIVE_NEWS = _keyword_matcher(["하락", "급락", "부진", "실적", "적자", "손실", "경고", "주의", "리콜", "조사"])
+
+
+# ai_opinion_for 분기 임계값 (오름차순) - 같은 구간이면 결과 문자열도 같음
+_PCT_BOUNDS = (5, 12, 20, 29.8)
+_TRADE_VALUE_BOUNDS = (100000, 200000, 500000)
+_VOLUME_BOUNDS = (10_000_000, 20_000_000, 50_000_000)
+
+# 구간 index별 문구 (index = bisect_right(bounds, value))
+_CTX_PCT = ("**보합세**", "**중간 강세**", "**강세 흐름**", "**급등 구간**", "**상한가 구간**")
+_CTX_TRADE_VALUE = (None, "거래대금이 **활발**", "거래대금이 **크게 증가**", "거래대금이 **폭발적으로 증가**")
+_CTX_VOLUME = (None, "거래량이 **활발**", "거래량이 **대폭 증가**", "거래량이 **폭증**")
+
+# (pct 구간, 거래대금 20억 이상, 거래량 1천만주 이상) -> 리스크/전략 문단
+_RISK_TEXT = {
+    4: ("**상한가 구간**이므로 추격매수는 매우 위험합니다.",
+        "거래대금이 폭발적으로 증가했으나, 이는 과열 신호일 수 있습니다.", None,
+        "보유자는 **변동성에 대비해 분할 청산/손절 기준을 명확히** 하시기 바랍니다."),
+    3: ("**급등 구간**이므로 추가 수급 유입을 확인하면서 **손절 라인을 먼저 정하는 것**이 중요합니다.",
+        "거래대금이 크게 증가하여 모멘텀이 강하지만, 조정 가능성도 있습니다.", None, None),
+    2: ("**강세 흐름**이 지속되고 있습니다.",
+        None, "거래량이 활발하여 유동성이 좋습니다.",
+        "**눌림 구간에서 분할 진입**을 고려하되, 거래대금이 유지되는지 확인하세요."),
+    1: ("**중간 강세** 구간입니다.", None, None,
+        "뉴스와 수급 변화를 지속적으로 모니터링하며, **추세가 지속되는지 확인**하세요."),
+    0: ("**단기 변동성이 낮은 편**입니다.", None, None,
+        "뉴스/수급 변화를 확인하며 **보수적으로 접근**하시기 바랍니다."),
+}
+
+# 급등(20%+) 시 시장별 문구
+_MARKET_NOTE = {
+    "KOSDAQ": "코스닥 특성상 **변동성이 크므로 리스크 관리**가 특히 중요합니다.",
+    "KOSPI": "코스피 대형주 특성상 **안정성은 높으나 상승 모멘텀 지속 여부**를 확인하세요.",
+}
+
+
+def _build_opinion_sentences() -> tuple:
+    """Pre-join the bucket-only sentences of ai_opinion_for (market context, risk)."""
+    context = {}
+    for pct_b, pct_txt in enumerate(_CTX_PCT):
+        for tv_b, tv_txt in enumerate(_CTX_TRADE_VALUE):
+            for vol_b, vol_txt in enumerate(_CTX_VOLUME):
+                ctx = [t for t in (pct_txt, tv_txt, vol_txt) if t]
+                context[(pct_b, tv_b, vol_b)] = f"현재 {', '.join(ctx)}한 상태입니다."
+    risk = {}
+    for pct_b, (head, hot_tv, active_vol, tail) in _RISK_TEXT.items():
+        for tv_hot in (False, True):
+            for vol_active in (False, True):
+                lines = [head, hot_tv if tv_hot else None, active_vol if vol_active else None, tail]
+                risk[(pct_b, tv_hot, vol_active)] = " ".join(t for t in lines if t)
+    return context, risk
+
+
+_CONTEXT_SENTENCE, _RISK_SENTENCE = _build_opinion_sentences()
 
 
 def ai_opinion_for(s: RisingStock, detail: Optional[StockDetail] = None) -> str:
@@ -430,44 +654,16 @@ def ai_opinion_for(s: RisingStock, detail: Optional[StockDetail] = None) -> str:
         parts = []
         
         # === 1. Market Context & Overall Assessment ===
-        market_context = []
-        if s.change_pct >= 29.8:
-            market_context.append("**상한가 구간**")
-        elif s.change_pct >= 20:
-            market_context.append("**급등 구간**")
-        elif s.change_pct >= 12:
-            market_context.append("**강세 흐름**")
-        elif s.change_pct >= 5:
-            market_context.append("**중간 강세**")
-        else:
-            market_context.append("**보합세**")
-        
-        if s.trade_value >= 500000:  # 50억 이상
-            market_context.append("거래대금이 **폭발적으로 증가**")
-        elif s.trade_value >= 200000:  # 20억 이상
-            market_context.append("거래대금이 **크게 증가**")
-        elif s.trade_value >= 100000:  # 10억 이상
-            market_context.append("거래대금이 **활발**")
-        
-        if s.volume >= 50000000:  # 5천만주 이상
-            market_context.append("거래량이 **폭증**")
-        elif s.volume >= 20000000:  # 2천만주 이상
-            market_context.append("거래량이 **대폭 증가**")
-        elif s.volume >= 10000000:  # 1천만주 이상
-            market_context.append("거래량이 **활발**")
-        
-        if market_context:
-            parts.append(f"현재 {', '.join(market_context)}한 상태입니다.")
+        pct_b = bisect.bisect_right(_PCT_BOUNDS, s.change_pct)
+        tv_b = bisect.bisect_right(_TRADE_VALUE_BOUNDS, s.trade_value)
+        vol_b = bisect.bisect_right(_VOLUME_BOUNDS, s.volume)
+        parts.append(_CONTEXT_SENTENCE[(pct_b, tv_b, vol_b)])
         
         # === 2. Investor Trend Analysis (Detailed) ===
         if detail and detail.investor_trends and len(detail.investor_trends) > 0:
             latest = detail.investor_trends[0]
-            if isinstance(latest, dict):
-                foreigner_val = latest.get("foreigner", 0)
-                institution_val = latest.get("institution", 0)
-            else:
-                foreigner_val = getattr(latest, "foreigner", 0) if hasattr(latest, "foreigner") else 0
-                institution_val = getattr(latest, "institution", 0) if hasattr(latest, "institution") else 0
+            foreigner_val = latest.foreigner
+            institution_val = latest.institution
             
             investor_analysis = []
             if foreigner_val > 200000:  # 외국인 순매수 2억 이상
@@ -495,16 +691,10 @@ def ai_opinion_for(s: RisingStock, detail: Optional[StockDetail] = None) -> str:
         if detail and detail.news and len(detail.news) > 0:
             news_list = detail.news if isinstance(detail.news, list) else []
             news_titles = " ".join([(n.get("title", "") if isinstance(n, dict) else str(n)) for n in news_list[:5]])
-            news_text = news_titles.lower()
             
-            # 긍정적 키워드
-            positive_keywords = ["인기 검색", "검색 종목", "급등", "상한가", "구조대", "왔다", "상승", "호재", 
-                               "실적", "수주", "계약", "승인", "인허가", "신약", "개발", "성공", "돌파"]
-            # 부정적 키워드
-            negative_keywords = ["하락", "급락", "부진", "실적", "적자", "손실", "경고", "주의", "리콜", "조사"]
-            
-            positive_count = sum(1 for kw in positive_keywords if kw in news_text)
-            negative_count = sum(1 for kw in negative_keywords if kw in news_text)
+            # 키워드는 한글이라 대소문자 변환 불필요 - 제목 문자열을 한 번씩만 훑음
+            positive_count = _count_keywords(_POSITIVE_NEWS, news_titles)
+            negative_count = _count_keywords(_NEGATIVE_NEWS, news_titles)
             
             if "인기 검색" in news_titles or "검색 종목" in news_titles:
                 parts.append("주가 상승의 주요 트리거는 **'인기 검색 종목'** 관련 이슈로 판단되며, 단기 모멘텀이 강합니다.")
@@ -547,12 +737,8 @@ def ai_opinion_for(s: RisingStock, detail: Optional[StockDetail] = None) -> str:
             financial_list = detail.financials if isinstance(detail.financials, list) else []
             if len(financial_list) > 0:
                 latest_fin = financial_list[0]
-                if isinstance(latest_fin, dict):
-                    sales = latest_fin.get("sales", 0)
-                    operating_profit = latest_fin.get("operating_profit", 0)
-                else:
-                    sales = getattr(latest_fin, "sales", 0) if hasattr(latest_fin, "sales") else 0
-                    operating_profit = getattr(latest_fin, "operating_profit", 0) if hasattr(latest_fin, "operating_profit") else 0
+                sales = latest_fin.get("sales", 0)
+                operating_profit = latest_fin.get("operating_profit", 0)
                 
                 if operating_profit > 0 and sales > 0:
                     margin = (operating_profit / sales) * 100
@@ -564,39 +750,12 @@ def ai_opinion_for(s: RisingStock, detail: Optional[StockDetail] = None) -> str:
                         parts.append("**재무 상태에 주의**가 필요하며, 실적 개선 여부를 지속 모니터링하세요.")
         
         # === 6. Risk Assessment & Trading Strategy ===
-        risk_parts = []
-        
-        if s.change_pct >= 29.8:
-            risk_parts.append("**상한가 구간**이므로 추격매수는 매우 위험합니다.")
-            if s.trade_value >= 200000:
-                risk_parts.append("거래대금이 폭발적으로 증가했으나, 이는 과열 신호일 수 있습니다.")
-            risk_parts.append("보유자는 **변동성에 대비해 분할 청산/손절 기준을 명확히** 하시기 바랍니다.")
-        elif s.change_pct >= 20:
-            risk_parts.append("**급등 구간**이므로 추가 수급 유입을 확인하면서 **손절 라인을 먼저 정하는 것**이 중요합니다.")
-            if s.trade_value >= 200000:
-                risk_parts.append("거래대금이 크게 증가하여 모멘텀이 강하지만, 조정 가능성도 있습니다.")
-        elif s.change_pct >= 12:
-            risk_parts.append("**강세 흐름**이 지속되고 있습니다.")
-            if s.volume >= 10000000:
-                risk_parts.append("거래량이 활발하여 유동성이 좋습니다.")
-            risk_parts.append("**눌림 구간에서 분할 진입**을 고려하되, 거래대금이 유지되는지 확인하세요.")
-        elif s.change_pct >= 5:
-            risk_parts.append("**중간 강세** 구간입니다.")
-            risk_parts.append("뉴스와 수급 변화를 지속적으로 모니터링하며, **추세가 지속되는지 확인**하세요.")
-        else:
-            risk_parts.append("**단기 변동성이 낮은 편**입니다.")
-            risk_parts.append("뉴스/수급 변화를 확인하며 **보수적으로 접근**하시기 바랍니다.")
-        
-        if risk_parts:
-            parts.append(" ".join(risk_parts))
+        # 거래대금 20억 이상 (tv_b >= 2), 거래량 1천만주 이상 (vol_b >= 1)
+        parts.append(_RISK_SENTENCE[(pct_b, tv_b >= 2, vol_b >= 1)])
         
         # === 7. Market-Specific Considerations ===
-        if s.market == "KOSDAQ":
-            if s.change_pct >= 20:
-                parts.append("코스닥 특성상 **변동성이 크므로 리스크 관리**가 특히 중요합니다.")
-        elif s.market == "KOSPI":
-            if s.change_pct >= 20:
-                parts.append("코스피 대형주 특성상 **안정성은 높으나 상승 모멘텀 지속 여부**를 확인하세요.")
+        if pct_b >= 3 and s.market in _MARKET_NOTE:  # 20% 이상
+            parts.append(_MARKET_NOTE[s.market])
         
         # === Final Summary ===
         if not parts:
@@ -605,17 +764,76 @@ def ai_opinion_for(s: RisingStock, detail: Optional[StockDetail] = None) -> str:
         return " ".join(parts)
 
 
-async def build_snapshot(client: httpx.AsyncClient) -> dict:
-    indices = await fetch_index_quotes(client)
-    kospi_rise = await fetch_rising_stocks(client, "KOSPI", limit=80)
-    kosdaq_rise = await fetch_rising_stocks(client, "KOSDAQ", limit=80)
-    merged = kospi_rise + kosdaq_rise
+def _opinion_key(s: RisingStock) -> tuple:
+    """Bucket the fields ai_opinion_for reads when no detail is available."""
+    return (
+        bisect.bisect_right(_PCT_BOUNDS, s.change_pct),
+        bisect.bisect_right(_TRADE_VALUE_BOUNDS, s.trade_value),
+        bisect.bisect_right(_VOLUME_BOUNDS, s.volume),
+        s.market,
+    )
+
+
+@functools.lru_cache(maxsize=256)  # 5 x 4 x 4 x 2 buckets
+def _basic_opinion(key: tuple) -> str:
+    """ai_opinion_for(s, None) evaluated once per bucket, on the bucket's lower bound."""
+    pct_b, tv_b, vol_b, market = key
+    rep = RisingStock(
+        code="",
+        name="",
+        price=0,
+        change=0,
+        change_pct=_PCT_BOUNDS[pct_b - 1] if pct_b else 0.0,
+        volume=_VOLUME_BOUNDS[vol_b - 1] if vol_b else 0,
+        trade_value=_TRADE_VALUE_BOUNDS[tv_b - 1] if tv_b else 0,
+        market=market,
+    )
+    return ai_opinion_for(rep, None)
+
+
+_ITEM_LINK = "https://finance.naver.com/item/main.naver?code={}".format
+
+# 짧은 TTL 스냅샷 캐시 - cache_loop / WebSocket refresh_loop 등 근접 호출은 한 번만 스크랩
+SNAPSHOT_TTL = float(os.getenv("NAVER_SNAPSHOT_TTL", "15"))  # seconds
+_snapshot_cache: Optional[tuple] = None  # (monotonic(), snapshot)
+_snapshot_lock = asyncio.Lock()
+
+
+async def build_snapshot(client: httpx.AsyncClient, force: bool = False) -> dict:
+    """
+    Snapshot of indices / rising stocks / themes, reused for SNAPSHOT_TTL seconds.
+    Concurrent callers wait on one in-flight build (double-checked under the lock).
+    `force=True` (explicit refresh) skips the TTL and always rebuilds.
+    The returned dict is shared between callers and must not be mutated.
+    """
+    global _snapshot_cache
+    cached = _snapshot_cache
+    if not force and cached is not None and monotonic() - cached[0] < SNAPSHOT_TTL:
+        return cached[1]
+    async with _snapshot_lock:
+        cached = _snapshot_cache
+        if not force and cached is not None and monotonic() - cached[0] < SNAPSHOT_TTL:
+            return cached[1]
+        snapshot = await _build_snapshot(client)
+        _snapshot_cache = (monotonic(), snapshot)
+        return snapshot
+
+
+async def _build_snapshot(client: httpx.AsyncClient) -> dict:
+    # 지수 / 상승 종목 목록은 서로 독립 → 동시에 요청 (순차 RTT 합 → 최대 RTT)
+    indices, kospi_rise, kosdaq_rise = await asyncio.gather(
+        fetch_index_quotes(client),
+        fetch_rising_stocks(client, "KOSPI", limit=80),
+        fetch_rising_stocks(client, "KOSDAQ", limit=80),
+    )
+    all_rising = kospi_rise + kosdaq_rise
     # Sort by Score (not just change_pct) to consider liquidity and participation
-    merged.sort(key=lambda x: calculate_score(x), reverse=True)
-    top30 = merged[:30]
+    # 종목당 점수는 한 번만 계산해서 정렬/응답에 재사용
+    scored = [(calculate_score(s), s) for s in all_rising]
+    # 상위 30개만 필요 → 전체 정렬 대신 부분 선택 (sorted(...)[:30]과 동일, 동점 순서 유지)
+    top30 = heapq.nlargest(30, scored, key=itemgetter(0))
     
     # Detect themes from all rising stocks (not just top30)
-    all_rising = kospi_rise + kosdaq_rise
     themes = detect_themes(all_rising)
 
     return {
@@ -633,17 +851,74 @@ async def build_snapshot(client: httpx.AsyncClient) -> dict:
                 "change_pct": s.change_pct,
                 "volume": s.volume,
                 "trade_value": s.trade_value,
-                "link": f"https://finance.naver.com/item/main.naver?code={s.code}",
-                "score": calculate_score(s),  # Improved scoring based on multiple factors
+                "link": _ITEM_LINK(s.code),
+                "score": score,  # Improved scoring based on multiple factors
                 "signals": signals_for(s),
-                "ai_opinion": ai_opinion_for(s, None),  # Basic opinion, will be enhanced with detail in modal
+                "ai_opinion": _basic_opinion(_opinion_key(s)),  # Basic opinion, will be enhanced with detail in modal
             }
-            for s in top30
+            for score, s in top30
         ],
         "source": "naver_finance",
     }
 
 
+def stock_detail_payload(detail: StockDetail, snapshot: Optional[dict] = None) -> dict:
+    """
+    Build the `/stock/{code}` response data for a detail.
+    The AI opinion uses the matching snapshot row when present, so it agrees
+    with the list view; otherwise it falls back to the detail's own quote.
+    """
+    rising_stock = None
+    if snapshot and snapshot.get("stocks"):
+        for s in snapshot.get("stocks", []):
+            if s.get("code") == detail.code:
+                rising_stock = RisingStock(
+                    code=s["code"],
+                    name=s["name"],
+                    price=s["price"],
+                    change=s.get("change", 0),
+                    change_pct=s.get("change_pct", 0.0),
+                    volume=s.get("volume", 0),
+                    trade_value=s.get("trade_value", 0),
+                    market=s.get("market", "KOSPI"),
+                )
+                break
+
+    if not rising_stock:
+        rising_stock = RisingStock(
+            code=detail.code,
+            name=detail.name,
+            price=detail.price,
+            change=detail.change,
+            change_pct=detail.change_pct,
+            volume=detail.volume,
+            trade_value=detail.trade_value,
+            market=detail.market,
+        )
+
+    return {
+        "code": detail.code,
+        "name": detail.name,
+        "price": detail.price,
+        "change": detail.change,
+        "change_pct": detail.change_pct,
+        "volume": detail.volume,
+        "trade_value": detail.trade_value,
+        "market": detail.market,
+        "pivot": {
+            "pivot": detail.pivot,
+            "r1": detail.r1,
+            "r2": detail.r2,
+            "s1": detail.s1,
+            "s2": detail.s2,
+        } if detail.pivot else None,
+        "news": detail.news or [],
+        "financials": detail.financials or [],
+        "investor_trends": detail.investor_trends or [],
+        "ai_opinion": ai_opinion_for(rising_stock, detail),
+    }
+
+
 def calculate_pivot_points(high: float, low: float, close: float) -> dict:
     """
     Calculate Pivot Point and support/resistance levels.
@@ -668,1113 +943,817 @@ def calculate_pivot_points(high: float, low: float, close: float) -> dict:
     }
 
 
-async def fetch_stock_detail(client: httpx.AsyncClient, code: str) -> Optional[StockDetail]:
-    """
-    Fetch detailed information for a specific stock from Naver Finance.
-    Includes: pivot points, news, financials, investor trends.
+def _tables_with_class(tables: list, classes: tuple) -> list:
+    """Same result as soup.select("table.a, table.b"), filtered from a pre-collected list."""
+    wanted = frozenset(classes)
+    return [t for t in tables if not wanted.isdisjoint(t.get("class") or ())]
+
+
+def _row_floats(rows: list, row_idx: Optional[int]) -> List[float]:
+    """All td values of rows[row_idx] parsed once, indexed by column (empty if the row is missing)."""
+    if row_idx is None or row_idx >= len(rows):
+        return []
+    return [_to_float(td.get_text(strip=True)) for td in rows[row_idx].find_all("td")]
+
+
+def _classify_fin_table(table) -> Optional[str]:
+    """"quarterly", "annual", or None when neither the labels nor the period columns tell."""
+    # 테이블 라벨 = caption + 바로 앞 제목(h3/h4) + 컬럼 헤더 텍스트
+    # (부모 div 전체 get_text 대신 필요한 요소만 읽음)
+    caption = table.find("caption")
+    heading = table.find_previous_sibling(["h3", "h4"])
+    # 컬럼 헤더: thead가 있으면 thead, 없으면 첫 번째 행
+    header_row = table.find("thead") or table.find("tr")
+    header_texts = [th.get_text(strip=True) for th in header_row.find_all("th")] if header_row else []
+    label = " ".join([
+        caption.get_text(strip=True) if caption else "",
+        heading.get_text(strip=True) if heading else "",
+        *header_texts,
+    ])
+    
+    # Check if this is a quarterly table (분기)
+    if "분기" in label:
+        return "quarterly"
+    # Check if this is an annual table (연간) - we want to skip this
+    if "연간" in label:
+        return "annual"
+    # If unclear, check column headers for quarterly patterns
+    # 분기 실적: 03, 06, 09, 12월이 섞여 있어야 함
+    # 연간 실적: 모든 컬럼이 12월이면 연간
+    months = [int(m.group(2)) for m in map(_PERIOD_RE.match, header_texts) if m]
+    if not months:
+        return None
+    if all(month == 12 for month in months):
+        return "annual"
+    if any(m in (3, 6, 9, 12) for m in months):
+        # 03, 06, 09, 12월이 섞여 있으면 분기 실적
+        return "quarterly"
+    # 불명확한 경우 연간으로 분류 (안전하게)
+    return "annual"
+
+
+def _parse_fin_table(table) -> list:
+    """Up to 4 most recent {"period", "sales", "operating_profit"} rows from one 실적 table.
+
+    Sales / operating-profit rows are found by their row header (the "(억원)" row wins over
+    ratio rows); periods come from the YYYY.MM column headers, excluding estimates (E).
     """
-    try:
-        # Main stock page
-        html = await _get(client, f"https://finance.naver.com/item/main.naver?code={code}")
-        soup = BeautifulSoup(html, "html.parser")
-        
-        # Debug: log if page loaded
-        if not soup:
-            print(f"Warning: Failed to parse HTML for {code}")
-            return None
-        
-        # Basic info
-        name_el = soup.select_one("h2.wrap_company a")
-        name = name_el.get_text(strip=True) if name_el else ""
-        
-        # Current price and change
-        no_today = soup.select_one("p.no_today")
-        price = 0
-        change = 0
-        change_pct = 0.0
-        if no_today:
-            price_el = no_today.select_one("span.blind")
-            if price_el:
-                price = _to_int(price_el.get_text(strip=True))
-            
-            # Change
-            change_el = soup.select_one("span.blind.sptxt")
-            if change_el:
-                change_text = change_el.find_next_sibling()
-                if change_text:
-                    change = _to_int(change_text.get_text(strip=True))
-                    # Determine sign from parent class
-                    parent = change_el.parent
-                    if parent and "down" in parent.get("class", []):
-                        change = -abs(change)
-            
-            # Change percentage
-            pct_el = soup.select_one("span.blind.sptxt")
-            if pct_el:
-                pct_text = pct_el.find_next_sibling()
-                if pct_text:
-                    change_pct = _to_float(pct_text.get_text(strip=True))
-                    if change < 0:
-                        change_pct = -abs(change_pct)
-        
-        # Volume and trade value
-        volume = 0
-        trade_value = 0
-        
-        # Parse trade value from table row with <th class="title">거래대금(백만)</th> and <span id="_amount">
-        # <th class="title">거래대금(백만)</th><td class="num"><span id="_amount">693</span></td>
-        # 이미 백만 단위이므로 1,000,000 곱하기
-        # 호가 정보 테이블은 제외하고, "주요 시세" 또는 "시세" 관련 테이블 우선 검색
-        all_tables_for_amount = soup.select("table")
-        priority_tables_for_amount = []
-        other_tables_for_amount = []
-        
-        for table in all_tables_for_amount:
-            table_summary = table.get("summary", "")
-            # 호가 정보 테이블 제외
-            if "호가 정보" in table_summary or "호가정보" in table_summary:
+    thead = table.find("thead")
+    
+    # 행 헤더에서 매출액/영업이익 찾기 (scope="row")
+    # 우선순위: "(억원)" 단위가 있는 절대값 데이터만 (비율 데이터 제외)
+    rows = table.find_all("tr")
+    sales_row_idx = None
+    profit_row_idx = None
+    
+    for i, row in enumerate(rows):
+        for rh in row.find_all("th"):
+            if rh.get("scope") != "row" and "h_th2" not in (rh.get("class") or ()):
                 continue
-            # "주요 시세" 또는 "시세" 관련 테이블 우선
-            if "주요 시세" in table_summary or "시세" in table_summary or "거래대금" in table_summary:
-                priority_tables_for_amount.append(table)
-            else:
-                other_tables_for_amount.append(table)
+            rh_text = rh.get_text(strip=True)
+            has_unit = "(억원)" in rh_text
+            is_ratio = "%" in rh_text or "률" in rh_text
+            # 매출액: "(억원)" 단위가 있거나, 비율/매출원가가 아닌 행 (First match takes priority)
+            if "매출액" in rh_text and (has_unit or not (is_ratio or "매출원가" in rh_text)):
+                if sales_row_idx is None:
+                    sales_row_idx = i
+            # 영업이익: "(억원)" 단위가 있거나, 비율이 아닌 행
+            elif ("영업이익" in rh_text or "영업손익" in rh_text) and (has_unit or not is_ratio):
+                if profit_row_idx is None:
+                    profit_row_idx = i
+    
+    if sales_row_idx is None and profit_row_idx is None:
+        return []
+    
+    # 컬럼 헤더에서 기간 정보 추출 (YYYY.MM 형식)
+    # period -> ((year, month) 정렬 키, 실제 컬럼 인덱스) - 매치 결과로 정렬 키까지 한 번에 계산
+    period_cols = {}
+    
+    # thead의 각 행(없으면 첫 번째 행)에서 컬럼 헤더와 인덱스 매핑
+    header_rows = thead.find_all("tr") if thead else table.find_all("tr", limit=1)
+    for header_row in header_rows:
+        for col_idx, th in enumerate(header_row.find_all("th")):
+            h_text = th.get_text(strip=True)
+            # (E)가 포함된 컬럼은 완전히 제외, 실제 데이터만 사용
+            period_match = _PERIOD_RE.match(h_text)
+            if period_match and "(E)" not in h_text and "(e)" not in h_text:
+                # YYYY.MM 형식만 추출
+                period = period_match.group(0)
+                if period not in period_cols:
+                    sort_key = (int(period_match.group(1)), int(period_match.group(2)))
+                    period_cols[period] = (sort_key, col_idx)
+    
+    # 최근 4개 기간만 (최신순)
+    period_data = sorted(period_cols.items(), key=lambda item: item[1][0], reverse=True)[:4]
+    
+    # 매출액/영업이익 행은 td 텍스트를 한 번에 숫자로 변환 (기간마다 select 반복 방지)
+    sales_vals = _row_floats(rows, sales_row_idx)
+    profit_vals = _row_floats(rows, profit_row_idx)
+    
+    result = []
+    for period, (_, col_idx) in period_data:
+        sales = sales_vals[col_idx] if col_idx < len(sales_vals) else 0.0
+        profit = profit_vals[col_idx] if col_idx < len(profit_vals) else 0.0
         
-        # 우선순위 테이블부터 검색
-        tables_to_check_for_amount = priority_tables_for_amount + other_tables_for_amount
+        # 실제 데이터가 있는 경우만 추가 (sales와 profit이 모두 0이면 제외)
+        # 단, 음수 영업이익은 유효한 데이터이므로 포함
+        if sales != 0 or profit != 0:
+            result.append({
+                "period": period,
+                "sales": sales,
+                "operating_profit": profit,
+            })
+    return result
+
+
+# Main-page news link selectors, tried in order (all end in an <a>)
+_NEWS_SELECTORS = [soupsieve.compile(sel) for sel in (
+    "div.news_area ul li a",
+    "div#news ul li a",
+    "table.news_table a",
+    "div.section.news ul li a",
+    "div.news_area a",
+    "ul.news_list a",
+    "div.news a",
+    "dl.news_list dt a",
+    "div.tab_con1 ul li a",
+    "div.tab_con ul li a",
+    "div.news_wrap ul li a",
+    "div.news_list ul li a",
+    "table.type_2 a[href*='news']",
+    "div.cmp_news ul li a",
+    "a[href*='/item/news']",  # Direct news links
+    "a[href*='news.naver.com']",  # External news links
+)]
+# Every selector above needs one of these container classes (or div#news) on an ancestor,
+# or "news" in the href - anchors with neither can never match, so they are dropped up front
+_NEWS_CONTAINER_CLASSES = frozenset((
+    "news_area", "news_table", "news", "news_list", "tab_con1", "tab_con", "news_wrap", "cmp_news",
+))
+
+
+def _maybe_news_link(a) -> bool:
+    """Cheap superset test for _NEWS_SELECTORS (soupsieve matching walks ancestors per selector)."""
+    if "news" in a.get("href", ""):
+        return True
+    for p in a.parents:
+        classes = p.get("class")
+        if (classes and not _NEWS_CONTAINER_CLASSES.isdisjoint(classes)) or p.get("id") == "news":
+            return True
+    return False
+
+
+# News date elements: inside the link's parent, then one level further up
+_NEWS_DATE_SEL = soupsieve.compile("span.date, span.time, em.date, span.info, em.info, span.txt")
+_NEWS_DATE_OUTER_SEL = soupsieve.compile("span.date, span.time, em.date, em.info, span.txt")
+
+
+def _parse_detail_html(html: str, code: str) -> Optional[StockDetail]:
+    """
+    Parse the main item page into a StockDetail (CPU-bound, runs in a worker thread).
+    news / investor_trends stay empty when the page has none so the caller can
+    fall back to the dedicated pages.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    
+    # Debug: log if page loaded
+    if not soup:
+        log.warning("Failed to parse HTML for %s", code)
+        return None
+    
+    # 트리를 한 번만 훑어 테이블/링크 목록 확보 → 이후 단계는 목록만 필터링
+    page_tables = soup.find_all("table")
+    page_anchors = soup.find_all("a")
+    
+    # Basic info
+    name_el = soup.select_one("h2.wrap_company a")
+    name = name_el.get_text(strip=True) if name_el else ""
+    
+    # Current price and change
+    no_today = soup.select_one("p.no_today")
+    price = 0
+    change = 0
+    change_pct = 0.0
+    if no_today:
+        price_el = no_today.select_one("span.blind")
+        if price_el:
+            price = _to_int(price_el.get_text(strip=True))
         
-        for table in tables_to_check_for_amount:
-            rows = table.select("tr")
-            for row in rows:
-                th = row.select_one("th.title, th")
-                if th:
-                    th_text = th.get_text(strip=True)
-                    # "거래대금"이 포함되어 있고 "(백만)" 단위가 명시된 경우
-                    if "거래대금" in th_text and ("백만" in th_text or "(백만)" in th_text):
-                        td = row.select_one("td")
-                        if td:
-                            amount_span = td.select_one("span#_amount")
-                            if amount_span:
-                                amount_text = amount_span.get_text(strip=True)
-                                amount_value = _to_int(amount_text)
-                                if amount_value > 0:
-                                    # 백만 단위이므로 1,000,000 곱하기
-                                    trade_value = amount_value * 1_000_000
-                                    break  # 찾았으면 중단
-            if trade_value > 0:
-                break  # 찾았으면 테이블 검색 중단
+        # Change
+        change_el = soup.select_one("span.blind.sptxt")
+        if change_el:
+            change_text = change_el.find_next_sibling()
+            if change_text:
+                change = _to_int(change_text.get_text(strip=True))
+                # Determine sign from parent class
+                parent = change_el.parent
+                if parent and "down" in parent.get("class", []):
+                    change = -abs(change)
         
-        # Parse volume from table structure
-        # 거래량: <span class="sptxt sp_txt9">거래량</span> 다음 <em> 태그 안의 숫자들
-        # 거래대금: <span class="sptxt sp_txt10">거래대금</span> 다음 <em> 태그 안의 숫자들, 그리고 <em> 다음 <span class="sptxt sp_txt11">백만</span>
-        # 호가 정보 테이블은 제외해야 함 (summary="호가 정보에 관한표입니다.")
-        summary_table = None
-        all_tables = soup.select("table.type_2, table.type_tax, table.no_info")
+        # Change percentage
+        pct_el = soup.select_one("span.blind.sptxt")
+        if pct_el:
+            pct_text = pct_el.find_next_sibling()
+            if pct_text:
+                change_pct = _to_float(pct_text.get_text(strip=True))
+                if change < 0:
+                    change_pct = -abs(change_pct)
+    
+    # Volume and trade value
+    volume = 0
+    trade_value = 0
+    
+    # Parse trade value from table row with <th class="title">거래대금(백만)</th> and <span id="_amount">
+    # <th class="title">거래대금(백만)</th><td class="num"><span id="_amount">693</span></td>
+    # 이미 백만 단위이므로 1,000,000 곱하기
+    # 호가 정보 테이블은 제외하고, "주요 시세" 또는 "시세" 관련 테이블 우선 검색
+    # span#_amount 에서 바로 행/테이블로 올라가서 조건 확인 (모든 테이블 x 행 순회 대신)
+    amount_found = []  # (우선순위 테이블 여부, 값)
+    for amount_span in soup.select("span#_amount"):
+        row = amount_span.find_parent("tr")
+        table = amount_span.find_parent("table")
+        if row is None or table is None:
+            continue
+        table_summary = table.get("summary", "")
+        # 호가 정보 테이블 제외
+        if "호가 정보" in table_summary or "호가정보" in table_summary:
+            continue
+        th = row.find("th")
+        td = row.find("td")
+        if th is None or td is None or td.select_one("span#_amount") is not amount_span:
+            continue
+        th_text = th.get_text(strip=True)
+        # "거래대금"이 포함되어 있고 "(백만)" 단위가 명시된 경우
+        if "거래대금" in th_text and ("백만" in th_text or "(백만)" in th_text):
+            amount_value = _to_int(amount_span.get_text(strip=True))
+            if amount_value > 0:
+                # "주요 시세" 또는 "시세" 관련 테이블 우선
+                priority = "주요 시세" in table_summary or "시세" in table_summary or "거래대금" in table_summary
+                amount_found.append((priority, amount_value))
+    if amount_found:
+        # 우선순위 테이블 값 먼저, 같은 우선순위면 문서 순서
+        amount_value = next((v for p, v in amount_found if p), amount_found[0][1])
+        # 백만 단위이므로 1,000,000 곱하기
+        trade_value = amount_value * 1_000_000
+    
+    # Parse volume from table structure
+    # 거래량: <span class="sptxt sp_txt9">거래량</span> 다음 <em> 태그 안의 숫자들
+    # 거래대금: <span class="sptxt sp_txt10">거래대금</span> 다음 <em> 태그 안의 숫자들, 그리고 <em> 다음 <span class="sptxt sp_txt11">백만</span>
+    # 호가 정보 테이블은 제외해야 함 (summary="호가 정보에 관한표입니다.")
+    summary_table = None
+    all_tables = _tables_with_class(page_tables, ("type_2", "type_tax", "no_info"))
+    for table in all_tables:
+        # 호가 정보 테이블 제외
+        table_summary = table.get("summary", "")
+        if "호가 정보" in table_summary or "호가정보" in table_summary:
+            continue
+        # "주요 시세" 또는 "시세" 관련 테이블 우선 선택
+        if "주요 시세" in table_summary or "시세" in table_summary or "거래대금" in table_summary:
+            summary_table = table
+            break
+    # 위에서 찾지 못했으면 호가 정보가 아닌 첫 번째 테이블 사용
+    if not summary_table:
         for table in all_tables:
-            # 호가 정보 테이블 제외
             table_summary = table.get("summary", "")
-            if "호가 정보" in table_summary or "호가정보" in table_summary:
-                continue
-            # "주요 시세" 또는 "시세" 관련 테이블 우선 선택
-            if "주요 시세" in table_summary or "시세" in table_summary or "거래대금" in table_summary:
+            if "호가 정보" not in table_summary and "호가정보" not in table_summary:
                 summary_table = table
                 break
-        # 위에서 찾지 못했으면 호가 정보가 아닌 첫 번째 테이블 사용
-        if not summary_table:
-            for table in all_tables:
-                table_summary = table.get("summary", "")
-                if "호가 정보" not in table_summary and "호가정보" not in table_summary:
-                    summary_table = table
-                    break
-        
-        if summary_table:
-            rows = summary_table.select("tr")
-            for row in rows:
-                # Find "거래량" or "거래대금" label
-                label_span = row.select_one("span.sptxt")
-                if label_span:
-                    label_text = label_span.get_text(strip=True)
-                    td = row.select_one("td")
-                    if td:
-                        # Find <em> tag after the label
-                        em_tag = td.select_one("em")
-                        if em_tag:
-                            # Extract number from <em> tag - get all text (handles both blind and noX spans)
-                            # 이미지 구조: <em> 안에 <span class="no4">4</span><span class="no2">2</span>... 형태
-                            number_text = em_tag.get_text(strip=True)
-                            number_value = _to_int(number_text)
-                            
-                            if "거래량" in label_text and volume == 0:
-                                volume = number_value
+    
+    # 시세 표의 행은 한 번만 수집 (거래량 / 전일 고가·저가·종가 탐색에서 공유)
+    summary_rows = summary_table.find_all("tr") if summary_table else []
+    
+    if summary_rows:
+        for row in summary_rows:
+            # Find "거래량" or "거래대금" label
+            label_span = row.find("span", class_="sptxt")
+            if label_span:
+                label_text = label_span.get_text(strip=True)
+                td = row.find("td")
+                if td:
+                    # Find <em> tag after the label
+                    em_tag = td.find("em")
+                    if em_tag:
+                        # Extract number from <em> tag - get all text (handles both blind and noX spans)
+                        # 이미지 구조: <em> 안에 <span class="no4">4</span><span class="no2">2</span>... 형태
+                        number_text = em_tag.get_text(strip=True)
+                        number_value = _to_int(number_text)
                         
-                        # Early exit if found
-                        if volume > 0:
-                            break
-        
-        # Method 3: Fallback to ID-based parsing for volume
-        if volume == 0:
-            quant_el = soup.select_one("span#_quant")
-            if quant_el:
-                volume = _to_int(quant_el.get_text(strip=True))
-        
-        # Market detection (KOSPI vs KOSDAQ)
-        market = "KOSPI"
-        if "코스닥" in html or "kosdaq" in html.lower():
-            market = "KOSDAQ"
-        
-        # Previous day data for pivot (고가/저가/종가) - optimized for speed
-        prev_high = None
-        prev_low = None
-        prev_close = None
-        
-        # Fast path: Try summary table first (most common location)
-        if summary_table:
-            rows = summary_table.select("tr")
+                        if "거래량" in label_text and volume == 0:
+                            volume = number_value
+                    
+                    # Early exit if found
+                    if volume > 0:
+                        break
+    
+    # Method 3: Fallback to ID-based parsing for volume
+    if volume == 0:
+        quant_el = soup.select_one("span#_quant")
+        if quant_el:
+            volume = _to_int(quant_el.get_text(strip=True))
+    
+    # Market detection (KOSPI vs KOSDAQ)
+    market = "KOSPI"
+    if _KOSDAQ_RE.search(html):
+        market = "KOSDAQ"
+    
+    # Previous day data for pivot (고가/저가/종가) - optimized for speed
+    prev_high = None
+    prev_low = None
+    prev_close = None
+    
+    # Fast path: Try summary table first (most common location)
+    if summary_rows:
+        for row in summary_rows:
+            th = row.find("th")
+            if th:
+                th_text = th.get_text(strip=True)
+                td = row.find("td")
+                if td:
+                    td_text = td.get_text(strip=True)
+                    if "전일" in th_text:
+                        if "고가" in th_text:
+                            prev_high = _to_float(td_text)
+                        elif "저가" in th_text:
+                            prev_low = _to_float(td_text)
+                        elif "종가" in th_text:
+                            prev_close = _to_float(td_text)
+                    # Early exit if we found all three
+                    if prev_high and prev_low and prev_close:
+                        break
+    
+    # Quick fallback: estimate from current price if prev_close not found
+    if not prev_close and price > 0:
+        if change != 0:
+            prev_close = price - change
+        else:
+            prev_close = price
+    
+    # Calculate pivot points immediately (don't wait for high/low)
+    pivot_data = None
+    if prev_close:
+        # Use estimated high/low if not available (faster than searching more tables)
+        if not prev_high:
+            prev_high = prev_close * 1.05
+        if not prev_low:
+            prev_low = prev_close * 0.95
+        pivot_data = calculate_pivot_points(prev_high, prev_low, prev_close)
+    
+    # Only search other tables if we still need high/low (optional, non-blocking)
+    if not (prev_high and prev_low) and summary_table:
+        # Quick scan of other tables (limited search for speed)
+        all_tables = _tables_with_class(page_tables, ("type_1", "tb_type1"))[:2]  # Limit to 2 tables
+        for table in all_tables:
+            rows = table.find_all("tr", limit=10)  # Limit to first 10 rows
             for row in rows:
-                th = row.select_one("th")
-                if th:
-                    th_text = th.get_text(strip=True)
-                    td = row.select_one("td")
-                    if td:
-                        td_text = td.get_text(strip=True)
-                        if "전일" in th_text:
-                            if "고가" in th_text:
-                                prev_high = _to_float(td_text)
-                            elif "저가" in th_text:
-                                prev_low = _to_float(td_text)
-                            elif "종가" in th_text:
-                                prev_close = _to_float(td_text)
-                        # Early exit if we found all three
-                        if prev_high and prev_low and prev_close:
-                            break
-        
-        # Quick fallback: estimate from current price if prev_close not found
-        if not prev_close and price > 0:
-            if change != 0:
-                prev_close = price - change
-            else:
-                prev_close = price
-        
-        # Calculate pivot points immediately (don't wait for high/low)
-        pivot_data = None
-        if prev_close:
-            # Use estimated high/low if not available (faster than searching more tables)
-            if not prev_high:
-                prev_high = prev_close * 1.05
-            if not prev_low:
-                prev_low = prev_close * 0.95
-            pivot_data = calculate_pivot_points(prev_high, prev_low, prev_close)
-        
-        # Only search other tables if we still need high/low (optional, non-blocking)
-        if not (prev_high and prev_low) and summary_table:
-            # Quick scan of other tables (limited search for speed)
-            all_tables = soup.select("table.type_1, table.tb_type1")[:2]  # Limit to 2 tables
-            for table in all_tables:
-                rows = table.select("tr")[:10]  # Limit to first 10 rows
-                for row in rows:
-                    cells = row.select("th, td")
-                    for i, cell in enumerate(cells):
-                        cell_text = cell.get_text(strip=True)
-                        if "전일" in cell_text and i + 1 < len(cells):
-                            if "고가" in cell_text and not prev_high:
-                                prev_high = _to_float(cells[i + 1].get_text(strip=True))
-                            elif "저가" in cell_text and not prev_low:
-                                prev_low = _to_float(cells[i + 1].get_text(strip=True))
-                        # Early exit if found
-                        if prev_high and prev_low:
-                            break
+                texts = [cell.get_text(strip=True) for cell in row.find_all(["th", "td"])]
+                for i, cell_text in enumerate(texts):
+                    if "전일" in cell_text and i + 1 < len(texts):
+                        if "고가" in cell_text and not prev_high:
+                            prev_high = _to_float(texts[i + 1])
+                        elif "저가" in cell_text and not prev_low:
+                            prev_low = _to_float(texts[i + 1])
+                    # Early exit if found
                     if prev_high and prev_low:
                         break
                 if prev_high and prev_low:
                     break
-            # Recalculate pivot if we found better high/low values
-            if (prev_high and prev_low and prev_close and 
-                (prev_high != prev_close * 1.05 or prev_low != prev_close * 0.95)):
-                pivot_data = calculate_pivot_points(prev_high, prev_low, prev_close)
-        
-        # Fetch news from news section - improved parsing with more selectors
-        news = []
-        # Try multiple selectors for news (expanded list)
-        news_selectors = [
-            "div.news_area ul li a",
-            "div#news ul li a",
-            "table.news_table a",
-            "div.section.news ul li a",
-            "div.news_area a",
-            "ul.news_list a",
-            "div.news a",
-            "dl.news_list dt a",
-            "div.tab_con1 ul li a",
-            "div.tab_con ul li a",
-            "div.news_wrap ul li a",
-            "div.news_list ul li a",
-            "table.type_2 a[href*='news']",
-            "div.cmp_news ul li a",
-            "a[href*='/item/news']",  # Direct news links
-            "a[href*='news.naver.com']",  # External news links
-        ]
-        for selector in news_selectors:
-            news_items = soup.select(selector)
-            if news_items:
-                for item in news_items[:15]:  # Check more items
-                    title = item.get_text(strip=True)
-                    href = item.get("href", "")
-                    # More lenient title filter - accept any meaningful title
-                    if title and len(title) > 2 and not any(skip in title for skip in ["더보기", "전체보기", "▼", "▲", "펼치기"]):
-                        # Clean title: ensure proper UTF-8 encoding
-                        try:
-                            # BeautifulSoup should already handle encoding, but ensure it's clean
-                            title_clean = title.strip()
-                            # Remove any control characters that might cause issues
-                            title_clean = ''.join(char for char in title_clean if ord(char) >= 32 or char in '\n\r\t')
-                        except Exception:
-                            title_clean = title.strip()
-                        
-                        # Extract date
-                        date = ""
-                        parent = item.parent
-                        if parent:
-                            date_el = parent.select_one("span.date, span.time, em.date, span.info, em.info, span.txt")
+            if prev_high and prev_low:
+                break
+        # Recalculate pivot if we found better high/low values
+        if (prev_high and prev_low and prev_close and 
+            (prev_high != prev_close * 1.05 or prev_low != prev_close * 0.95)):
+            pivot_data = calculate_pivot_points(prev_high, prev_low, prev_close)
+    
+    # Fetch news from news section - improved parsing with more selectors
+    news = []
+    seen_urls: set = set()
+    # 뉴스 후보 링크만 추린 뒤 셀렉터를 우선순위대로 적용 (16개 셀렉터 × 페이지 전체 링크 매칭 방지)
+    news_anchors = [a for a in page_anchors if _maybe_news_link(a)]
+    # Try multiple selectors for news (expanded list)
+    for selector in _NEWS_SELECTORS:
+        news_items = [a for a in news_anchors if selector.match(a)]
+        if news_items:
+            for item in news_items[:15]:  # Check more items
+                title = item.get_text(strip=True)
+                href = item.get("href", "")
+                # More lenient title filter - accept any meaningful title
+                if title and len(title) > 2 and not any(skip in title for skip in ["더보기", "전체보기", "▼", "▲", "펼치기"]):
+                    # Clean title: remove any control characters that might cause issues
+                    title_clean = title.strip().translate(_CTRL_CHARS)
+                    
+                    # Extract date
+                    date = ""
+                    parent = item.parent
+                    if parent:
+                        date_el = _NEWS_DATE_SEL.select_one(parent)
+                        if date_el:
+                            date = date_el.get_text(strip=True)
+                        # Also check siblings (첫 번째 일치 형제에서 중단, 형제 목록을 만들지 않음)
+                        sibling = parent.find_next_sibling(["span", "em"], class_=["date", "time"])
+                        if sibling:
+                            date = sibling.get_text(strip=True)
+                        # Check parent's parent for date
+                        if not date and parent.parent:
+                            date_el = _NEWS_DATE_OUTER_SEL.select_one(parent.parent)
                             if date_el:
                                 date = date_el.get_text(strip=True)
-                            # Also check siblings
-                            for sibling in parent.find_next_siblings():
-                                if sibling.name in ["span", "em"] and ("date" in sibling.get("class", []) or "time" in sibling.get("class", [])):
-                                    date = sibling.get_text(strip=True)
-                                    break
-                            # Check parent's parent for date
-                            if not date and parent.parent:
-                                date_el = parent.parent.select_one("span.date, span.time, em.date, em.info, span.txt")
-                                if date_el:
-                                    date = date_el.get_text(strip=True)
-                        
-                        # Build full URL
-                        if href.startswith("/"):
-                            full_url = f"https://finance.naver.com{href}"
-                        elif href.startswith("http"):
-                            full_url = href
-                        elif href:
-                            full_url = f"https://finance.naver.com/{href}"
-                        else:
-                            continue  # Skip if no valid href
-                        
-                        # Avoid duplicates
-                        if not any(n.get("url") == full_url for n in news):
-                            # Ensure proper UTF-8 encoding for title
-                            try:
-                                # Clean title: remove any invalid characters
-                                title_clean = title.encode('utf-8', errors='ignore').decode('utf-8')
-                                news.append({
-                                    "title": title_clean,
-                                    "date": date,
-                                    "url": full_url,
-                                })
-                            except Exception:
-                                # Fallback: use original title
-                                news.append({
-                                    "title": title,
-                                    "date": date,
-                                    "url": full_url,
-                                })
-                            if len(news) >= 5:  # Stop at 5 news items
-                                break
-                if len(news) >= 5:
-                    break  # Found enough news, stop trying other selectors
-        
-        if news:
-            print(f"[{code}] Found {len(news)} news items")
-        else:
-            print(f"[{code}] No news found in main page")
-        
-        # If no news found, try fetching from news page (parallel fetch for speed)
-        if not news:
-            try:
-                # Use shorter timeout for news page
-                news_res = await client.get(
-                    f"https://finance.naver.com/item/news.naver?code={code}",
-                    follow_redirects=True,
-                    timeout=10.0
-                )
-                news_res.encoding = "euc-kr"
-                news_html = news_res.text
-                news_soup = BeautifulSoup(news_html, "html.parser")
-                # More comprehensive selectors for news page
-                news_items = news_soup.select(
-                    "dl dt a, table.news_table a, ul.news_list a, "
-                    "div.news_area ul li a, div#news ul li a, "
-                    "div.tab_con1 ul li a, div.news_list ul li a"
-                )
-                for item in news_items[:10]:
-                    title = item.get_text(strip=True)
-                    href = item.get("href", "")
-                    if title and len(title) > 3 and not title.startswith("더보기"):
-                        # Clean title: ensure proper UTF-8 encoding
-                        try:
-                            title_clean = title.strip()
-                            # Remove any control characters that might cause issues
-                            title_clean = ''.join(char for char in title_clean if ord(char) >= 32 or char in '\n\r\t')
-                        except Exception:
-                            title_clean = title.strip()
-                        
-                        if href.startswith("/"):
-                            full_url = f"https://finance.naver.com{href}"
-                        elif href.startswith("http"):
-                            full_url = href
-                        elif href:
-                            full_url = f"https://finance.naver.com/{href}"
-                        else:
-                            continue
-                        
-                        # Avoid duplicates
-                        if not any(n.get("url") == full_url for n in news):
-                            news.append({
-                                "title": title_clean,
-                                "date": "",
-                                "url": full_url,
-                            })
-                            if len(news) >= 5:
-                                break
-            except Exception as e:
-                print(f"Warning: Failed to fetch news page for {code}: {e}")
-                # Continue without news - don't block the response
-        
-        # Financial summary (재무 요약) - parse from QUARTERLY financial table (not annual)
-        # Try main page first (already loaded) for speed
-        financials = []
-        # First try main page (already loaded) - prioritize QUARTERLY tables over annual
-        # Look for quarterly table first (최근 분기 실적)
-        fin_tables = soup.select("table.type_2, table.tb_type1, table.tb_type1_ifrs, table.sise")
-        
-        # Separate quarterly and annual tables
-        quarterly_tables = []
-        annual_tables = []
-        
-        for table in fin_tables:
-            # Check caption or nearby text to identify table type
-            caption = table.select_one("caption")
-            caption_text = caption.get_text(strip=True) if caption else ""
-            
-            # Check parent div or h4 for table title
-            parent = table.find_parent(["div", "section"])
-            parent_text = parent.get_text(strip=True) if parent else ""
-            
-            # Check if this is a quarterly table (분기)
-            if "분기" in caption_text or "분기" in parent_text:
-                quarterly_tables.append(table)
-            # Check if this is an annual table (연간) - we want to skip this
-            elif "연간" in caption_text or "연간" in parent_text:
-                annual_tables.append(table)
-            else:
-                # If unclear, check column headers for quarterly patterns
-                # 분기 실적: 03, 06, 09, 12월이 섞여 있어야 함
-                # 연간 실적: 모든 컬럼이 12월이면 연간
-                thead = table.select_one("thead")
-                if thead:
-                    headers = thead.select("th")
-                    header_texts = [h.get_text(strip=True) for h in headers]
-                    # Extract all date periods from headers
-                    date_periods = []
-                    for h_text in header_texts:
-                        period_match = re.match(r'(\d{4})\.(\d{1,2})', h_text)
-                        if period_match:
-                            year = int(period_match.group(1))
-                            month = int(period_match.group(2))
-                            date_periods.append((year, month))
-                    
-                    if len(date_periods) > 0:
-                        # Check if all months are December (연간 실적 패턴)
-                        all_december = all(month == 12 for _, month in date_periods)
-                        if all_december:
-                            # 연간 실적 테이블로 분류
-                            annual_tables.append(table)
-                        else:
-                            # 03, 06, 09, 12월이 섞여 있으면 분기 실적
-                            months = [month for _, month in date_periods]
-                            has_quarterly_months = any(m in [3, 6, 9, 12] for m in months)
-                            if has_quarterly_months:
-                                quarterly_tables.append(table)
-                            else:
-                                # 불명확한 경우 연간으로 분류 (안전하게)
-                                annual_tables.append(table)
-                else:
-                    # If no thead, check first row
-                    first_row = table.select_one("tr")
-                    if first_row:
-                        first_row_ths = first_row.select("th")
-                        date_periods = []
-                        for th in first_row_ths:
-                            h_text = th.get_text(strip=True)
-                            period_match = re.match(r'(\d{4})\.(\d{1,2})', h_text)
-                            if period_match:
-                                year = int(period_match.group(1))
-                                month = int(period_match.group(2))
-                                date_periods.append((year, month))
-                        
-                        if len(date_periods) > 0:
-                            all_december = all(month == 12 for _, month in date_periods)
-                            if all_december:
-                                annual_tables.append(table)
-                            else:
-                                months = [month for _, month in date_periods]
-                                has_quarterly_months = any(m in [3, 6, 9, 12] for m in months)
-                                if has_quarterly_months:
-                                    quarterly_tables.append(table)
-                                else:
-                                    annual_tables.append(table)
-        
-        # Process quarterly tables first (우선순위)
-        for table in quarterly_tables:
-            # 컬럼 헤더 찾기 (scope="col" 또는 thead 내부)
-            thead = table.select_one("thead")
-            col_headers = []
-            if thead:
-                col_headers = thead.select("th[scope='col'], th")
-            else:
-                # thead가 없으면 첫 번째 행의 th를 컬럼 헤더로 간주
-                first_row = table.select_one("tr")
-                if first_row:
-                    col_headers = first_row.select("th")
-            
-            col_header_texts = [h.get_text(strip=True) for h in col_headers]
-            
-            # 행 헤더에서 매출액/영업이익 찾기 (scope="row")
-            # 우선순위: "(억원)" 단위가 있는 절대값 데이터만 (비율 데이터 제외)
-            rows = table.select("tr")
-            sales_row_idx = None
-            profit_row_idx = None
-            
-            for i, row in enumerate(rows):
-                row_headers = row.select("th[scope='row'], th.h_th2")
-                for rh in row_headers:
-                    rh_text = rh.get_text(strip=True)
-                    # 매출액: "(억원)" 단위가 있는 것만 (비율 제외)
-                    if "매출액" in rh_text and "(억원)" in rh_text:
-                        if sales_row_idx is None:  # First match takes priority
-                            sales_row_idx = i
-                    elif "매출액" in rh_text and "매출원가" not in rh_text and "%" not in rh_text and "률" not in rh_text:
-                        # Fallback: 매출액이지만 비율이 아닌 경우
-                        if sales_row_idx is None:
-                            sales_row_idx = i
-                    # 영업이익: "(억원)" 단위가 있는 것만 (비율 제외)
-                    elif ("영업이익" in rh_text or "영업손익" in rh_text) and "(억원)" in rh_text:
-                        if profit_row_idx is None:  # First match takes priority
-                            profit_row_idx = i
-                    elif ("영업이익" in rh_text or "영업손익" in rh_text) and "%" not in rh_text and "률" not in rh_text:
-                        # Fallback: 영업이익이지만 비율이 아닌 경우
-                        if profit_row_idx is None:
-                            profit_row_idx = i
-            
-            # 매출액/영업이익 행이 있으면 파싱
-            if sales_row_idx is not None or profit_row_idx is not None:
-                # 컬럼 헤더에서 기간 정보 추출 (YYYY.MM 형식)
-                # thead의 th[scope='col']에서 날짜 헤더 찾기
-                periods = []
-                period_col_indices = []  # 각 period의 실제 컬럼 인덱스
-                
-                # thead에서 직접 컬럼 헤더와 인덱스 매핑
-                if thead:
-                    thead_rows = thead.select("tr")
-                    for thead_row in thead_rows:
-                        thead_ths = thead_row.select("th[scope='col'], th")
-                        for col_idx, th in enumerate(thead_ths):
-                            h_text = th.get_text(strip=True)
-                            # (E)가 포함된 컬럼은 완전히 제외, 실제 데이터만 사용
-                            if re.match(r'\d{4}\.\d{1,2}', h_text) and "(E)" not in h_text and "(e)" not in h_text:
-                                # YYYY.MM 형식만 추출
-                                period_match = re.match(r'(\d{4}\.\d{1,2})', h_text)
-                                if period_match:
-                                    period = period_match.group(1)
-                                    if period not in periods:
-                                        periods.append(period)
-                                        period_col_indices.append(col_idx)
-                else:
-                    # thead가 없으면 첫 번째 행의 th에서 찾기
-                    first_row = table.select_one("tr")
-                    if first_row:
-                        first_row_ths = first_row.select("th")
-                        for col_idx, th in enumerate(first_row_ths):
-                            h_text = th.get_text(strip=True)
-                            # (E)가 포함된 컬럼은 완전히 제외, 실제 데이터만 사용
-                            if re.match(r'\d{4}\.\d{1,2}', h_text) and "(E)" not in h_text and "(e)" not in h_text:
-                                period_match = re.match(r'(\d{4}\.\d{1,2})', h_text)
-                                if period_match:
-                                    period = period_match.group(1)
-                                    if period not in periods:
-                                        periods.append(period)
-                                        period_col_indices.append(col_idx)
-                
-                # 최근 4개 기간만 (최신순) - 날짜를 파싱해서 정렬
-                # 날짜 형식: YYYY.MM 또는 YYYY.MM.DD
-                def parse_period(period_str):
-                    """Parse period string to tuple for sorting (year, month)"""
-                    match = re.match(r'(\d{4})\.(\d{1,2})', period_str)
-                    if match:
-                        return (int(match.group(1)), int(match.group(2)))
-                    return (0, 0)
-                
-                # Sort periods by date (newest first), then take first 4
-                period_data = list(zip(periods, period_col_indices))
-                period_data.sort(key=lambda x: parse_period(x[0]), reverse=True)  # 최신순
-                period_data = period_data[:4]  # 최근 4개만
-                
-                # Unzip back to lists
-                periods = [p[0] for p in period_data]
-                period_col_indices = [p[1] for p in period_data]
-                
-                # 매출액/영업이익 행의 데이터 가져오기
-                for period_idx, period in enumerate(periods):
-                    sales = 0.0
-                    profit = 0.0
                     
-                    # 컬럼 인덱스 사용 (thead에서 찾은 정확한 인덱스)
-                    if period_idx < len(period_col_indices):
-                        col_idx = period_col_indices[period_idx]
+                    # Build full URL
+                    if href.startswith("/"):
+                        full_url = f"https://finance.naver.com{href}"
+                    elif href.startswith("http"):
+                        full_url = href
+                    elif href:
+                        full_url = f"https://finance.naver.com/{href}"
                     else:
-                        # Fallback: period_idx + 1 (첫 번째 컬럼이 행 헤더일 수 있음)
-                        col_idx = period_idx + 1
+                        continue  # Skip if no valid href
                     
-                    # 매출액 행에서 값 가져오기
-                    if sales_row_idx is not None and sales_row_idx < len(rows):
-                        sales_row = rows[sales_row_idx]
-                        sales_tds = sales_row.select("td")
-                        if col_idx < len(sales_tds):
-                            sales = _to_float(sales_tds[col_idx].get_text(strip=True))
-                    
-                    # 영업이익 행에서 값 가져오기
-                    if profit_row_idx is not None and profit_row_idx < len(rows):
-                        profit_row = rows[profit_row_idx]
-                        profit_tds = profit_row.select("td")
-                        if col_idx < len(profit_tds):
-                            profit = _to_float(profit_tds[col_idx].get_text(strip=True))
-                    
-                    # 실제 데이터가 있는 경우만 추가 (sales와 profit이 모두 0이면 제외)
-                    # 단, 음수 영업이익은 유효한 데이터이므로 포함
-                    if sales != 0 or profit != 0:
-                        financials.append({
-                            "period": period,
-                            "sales": sales,
-                            "operating_profit": profit,
+                    # Avoid duplicates
+                    if full_url not in seen_urls:
+                        seen_urls.add(full_url)
+                        news.append({
+                            "title": title_clean,
+                            "date": date,
+                            "url": full_url,
                         })
-                
-                if len(financials) > 0:
-                    break
-            
-            # Skip fallback for this table - we already processed quarterly tables above
-        
-        # If no quarterly data found, try other tables (but skip annual tables)
-        # 연간 실적 테이블은 완전히 제외
-        if len(financials) == 0:
-            for table in fin_tables:
-                # Skip if this is an annual table (이미 분류된 연간 테이블 제외)
-                if table in annual_tables:
-                    continue
-                
-                # Skip if this is an annual table (텍스트 기반 체크)
-                caption = table.select_one("caption")
-                caption_text = caption.get_text(strip=True) if caption else ""
-                parent = table.find_parent(["div", "section"])
-                parent_text = parent.get_text(strip=True) if parent else ""
-                if "연간" in caption_text or "연간" in parent_text:
-                    continue  # Skip annual tables
-                
-                # Try the same parsing logic
-                thead = table.select_one("thead")
-                col_headers = []
-                if thead:
-                    col_headers = thead.select("th[scope='col'], th")
-                else:
-                    first_row = table.select_one("tr")
-                    if first_row:
-                        col_headers = first_row.select("th")
-                
-                col_header_texts = [h.get_text(strip=True) for h in col_headers]
-                rows = table.select("tr")
-                sales_row_idx = None
-                profit_row_idx = None
-                
-                for i, row in enumerate(rows):
-                    row_headers = row.select("th[scope='row'], th.h_th2")
-                    for rh in row_headers:
-                        rh_text = rh.get_text(strip=True)
-                        if "매출액" in rh_text and "(억원)" in rh_text:
-                            if sales_row_idx is None:
-                                sales_row_idx = i
-                        elif "매출액" in rh_text and "매출원가" not in rh_text and "%" not in rh_text and "률" not in rh_text:
-                            if sales_row_idx is None:
-                                sales_row_idx = i
-                        elif ("영업이익" in rh_text or "영업손익" in rh_text) and "(억원)" in rh_text:
-                            if profit_row_idx is None:
-                                profit_row_idx = i
-                        elif ("영업이익" in rh_text or "영업손익" in rh_text) and "%" not in rh_text and "률" not in rh_text:
-                            if profit_row_idx is None:
-                                profit_row_idx = i
-                
-                if sales_row_idx is not None or profit_row_idx is not None:
-                    # Same parsing logic as above
-                    periods = []
-                    period_col_indices = []
-                    
-                    if thead:
-                        thead_rows = thead.select("tr")
-                        for thead_row in thead_rows:
-                            thead_ths = thead_row.select("th[scope='col'], th")
-                            for col_idx, th in enumerate(thead_ths):
-                                h_text = th.get_text(strip=True)
-                                # (E)가 포함된 컬럼은 완전히 제외, 실제 데이터만 사용
-                                if re.match(r'\d{4}\.\d{1,2}', h_text) and "(E)" not in h_text and "(e)" not in h_text:
-                                    period_match = re.match(r'(\d{4}\.\d{1,2})', h_text)
-                                    if period_match:
-                                        period = period_match.group(1)
-                                        if period not in periods:
-                                            periods.append(period)
-                                            period_col_indices.append(col_idx)
-                    
-                    # 최근 4개 기간만 (최신순) - 날짜를 파싱해서 정렬
-                    def parse_period(period_str):
-                        """Parse period string to tuple for sorting (year, month)"""
-                        match = re.match(r'(\d{4})\.(\d{1,2})', period_str)
-                        if match:
-                            return (int(match.group(1)), int(match.group(2)))
-                        return (0, 0)
-                    
-                    # Sort periods by date (newest first), then take first 4
-                    period_data = list(zip(periods, period_col_indices))
-                    period_data.sort(key=lambda x: parse_period(x[0]), reverse=True)  # 최신순
-                    period_data = period_data[:4]  # 최근 4개만
-                    
-                    # Unzip back to lists
-                    periods = [p[0] for p in period_data]
-                    period_col_indices = [p[1] for p in period_data]
-                    
-                    for period_idx, period in enumerate(periods):
-                        sales = 0.0
-                        profit = 0.0
-                        
-                        if period_idx < len(period_col_indices):
-                            col_idx = period_col_indices[period_idx]
-                        else:
-                            col_idx = period_idx + 1
-                        
-                        if sales_row_idx is not None and sales_row_idx < len(rows):
-                            sales_row = rows[sales_row_idx]
-                            sales_tds = sales_row.select("td")
-                            if col_idx < len(sales_tds):
-                                sales = _to_float(sales_tds[col_idx].get_text(strip=True))
-                        
-                        if profit_row_idx is not None and profit_row_idx < len(rows):
-                            profit_row = rows[profit_row_idx]
-                            profit_tds = profit_row.select("td")
-                            if col_idx < len(profit_tds):
-                                profit = _to_float(profit_tds[col_idx].get_text(strip=True))
-                        
-                        # 실제 데이터가 있는 경우만 추가
-                        if sales != 0 or profit != 0:
-                            financials.append({
-                                "period": period,
-                                "sales": sales,
-                                "operating_profit": profit,
-                            })
-                    
-                    if len(financials) > 0:
-                        break
+                        if len(news) >= 5:  # Stop at 5 news items
+                            break
+            if len(news) >= 5:
+                break  # Found enough news, stop trying other selectors
+    
+    if news:
+        log.debug("[%s] Found %d news items", code, len(news))
+    else:
+        log.debug("[%s] No news found in main page", code)
+    
+    # Financial summary (재무 요약) - parse from QUARTERLY financial table (not annual)
+    # Try main page first (already loaded) for speed
+    financials = []
+    # First try main page (already loaded) - prioritize QUARTERLY tables over annual
+    # Look for quarterly table first (최근 분기 실적)
+    # 매출액/영업이익 행 헤더가 html에 없으면 테이블 분류 자체를 건너뜀 (문자열 검색만으로 판단)
+    if "매출액" in html or "영업이익" in html or "영업손익" in html:
+        fin_tables = _tables_with_class(page_tables, ("type_2", "tb_type1", "tb_type1_ifrs", "sise"))
+    else:
+        fin_tables = []
+    
+    # 분류하면서 바로 처리: 분기 실적을 찾으면 나머지 테이블은 분류하지 않음
+    unclassified_tables = []
+    for table in fin_tables:
+        kind = _classify_fin_table(table)
+        if kind == "quarterly":
+            financials = _parse_fin_table(table)
+            if financials:
+                break
+        elif kind is None:
+            unclassified_tables.append(table)
+    
+    # If no quarterly data found, try unclassified tables (연간 실적 테이블은 완전히 제외)
+    if not financials:
+        for table in unclassified_tables:
+            financials = _parse_fin_table(table)
+            if financials:
+                break
+    
+    # Convert financials from list to date-keyed object structure
+    # Structure: {"2024.12": {"sales": 195, "operating_profit": -10}, ...}
+    financials_dict = {}
+    if financials:
+        # _parse_fin_table already returns newest-first (same (year, month) key), so no re-sort
+        financials_dict = {
+            f["period"]: {"sales": f["sales"], "operating_profit": f["operating_profit"]}
+            for f in financials
+        }
         
-        # Convert financials from list to date-keyed object structure
-        # Structure: {"2024.12": {"sales": 195, "operating_profit": -10}, ...}
-        financials_dict = {}
-        if financials:
-            def parse_period_for_sort(period_str):
-                """Parse period string to tuple for sorting (year, month)"""
-                match = re.match(r'(\d{4})\.(\d{1,2})', period_str)
-                if match:
-                    return (int(match.group(1)), int(match.group(2)))
-                return (0, 0)
-            
-            # Sort by period (newest first) to ensure consistent ordering
-            financials.sort(key=lambda x: parse_period_for_sort(x.get("period", "")), reverse=True)
+        log.debug("[%s] Found %d financial records (quarterly)", code, len(financials_dict))
+    else:
+        log.debug("[%s] No quarterly financial data found in main page", code)
+    
+    # Use dictionary structure instead of list (empty dict becomes None)
+    financials = financials_dict if financials_dict else None
+    
+    # Only try other pages if not found in main page (to speed up)
+    # Skip - we prioritize quarterly tables from main page
+    
+    # Investor trends (투자자별 매매동향) - parse from investor table
+    # Try main page first (already loaded) for speed
+    investor_trends = []
+    # 기관/외국인 헤더가 둘 다 있어야 하므로 html에 없으면 테이블 순회 생략
+    if "기관" in html and "외국인" in html:
+        inv_tables = _tables_with_class(page_tables, ("type_2", "tb_type1", "type_1", "sise"))
+    else:
+        inv_tables = []
+    
+    # 우선순위: summary/caption에 투자자 관련 키워드가 있는 테이블부터 처리
+    # 우선순위 테이블은 만나는 즉시 파싱하고, 나머지는 모아 두었다가 필요할 때만 파싱
+    other_tables = []
+    for table in inv_tables:
+        # 호가 정보 테이블 제외
+        table_summary = table.get("summary", "")
+        if "호가 정보" in table_summary or "호가정보" in table_summary:
+            continue
+        if not _is_investor_priority(table, table_summary):
+            other_tables.append(table)
+            continue
+        investor_trends = _parse_investor_table(table)
+        if investor_trends:
+            break
+    else:
+        for table in other_tables:
+            investor_trends = _parse_investor_table(table)
+            if investor_trends:
+                break
+    
+    if investor_trends:
+        log.debug("[%s] Found %d investor trend records", code, len(investor_trends))
+    else:
+        log.debug("[%s] No investor trend data found in main page", code)
+
+    return StockDetail(
+        code=code,
+        name=name,
+        price=price,
+        change=change,
+        change_pct=change_pct,
+        volume=volume,
+        trade_value=trade_value,
+        market=market,
+        pivot=pivot_data["pivot"] if pivot_data else None,
+        r1=pivot_data["r1"] if pivot_data else None,
+        r2=pivot_data["r2"] if pivot_data else None,
+        s1=pivot_data["s1"] if pivot_data else None,
+        s2=pivot_data["s2"] if pivot_data else None,
+        prev_high=prev_high,
+        prev_low=prev_low,
+        prev_close=prev_close,
+        news=news if news else [],
+        financials=financials,
+        investor_trends=investor_trends if investor_trends else None,
+    )
+
+
+def _parse_news_page(news_html: str) -> List[dict]:
+    """Parse news items from item/news.naver (fallback when the main page has none)."""
+    news = []
+    seen_urls: set = set()
+    news_soup = BeautifulSoup(news_html, "lxml")
+    # More comprehensive selectors for news page
+    news_items = news_soup.select(
+        "dl dt a, table.news_table a, ul.news_list a, "
+        "div.news_area ul li a, div#news ul li a, "
+        "div.tab_con1 ul li a, div.news_list ul li a",
+        limit=10,
+    )
+    for item in news_items:
+        title = item.get_text(strip=True)
+        href = item.get("href", "")
+        if title and len(title) > 3 and not title.startswith("더보기"):
+            # Clean title: remove any control characters that might cause issues
+            title_clean = title.strip().translate(_CTRL_CHARS)
             
-            # Convert to date-keyed dictionary
-            for f in financials:
-                period = f.get("period", "")
-                if period:
-                    financials_dict[period] = {
-                        "sales": f.get("sales", 0.0),
-                        "operating_profit": f.get("operating_profit", 0.0),
-                    }
+            if href.startswith("/"):
+                full_url = f"https://finance.naver.com{href}"
+            elif href.startswith("http"):
+                full_url = href
+            elif href:
+                full_url = f"https://finance.naver.com/{href}"
+            else:
+                continue
             
-            print(f"[{code}] Found {len(financials_dict)} financial records (quarterly)")
+            # Avoid duplicates
+            if full_url not in seen_urls:
+                seen_urls.add(full_url)
+                news.append({
+                    "title": title_clean,
+                    "date": "",
+                    "url": full_url,
+                })
+                if len(news) >= 5:
+                    break
+    return news
+
+
+def _is_investor_priority(table, table_summary: str) -> bool:
+    """summary나 caption에 투자자 관련 키워드가 있는 테이블"""
+    if _INVESTOR_KEYWORD_RE.search(table_summary):
+        return True  # summary로 판정되면 caption은 찾지 않음
+    caption = table.find("caption")
+    return bool(caption and _INVESTOR_KEYWORD_RE.search(caption.get_text(strip=True)))
+
+
+def _parse_investor_table(table) -> List[InvestorTrend]:
+    """Up to 5 most recent 기관/외국인 rows from one investor table ([] if it is not one)."""
+    # 기관/외국인 헤더가 모두 보이면 바로 중단 (나머지 th 텍스트는 추출하지 않음)
+    has_institution = has_foreigner = False
+    for th in table.find_all("th"):
+        h = th.get_text(strip=True)
+        has_institution = has_institution or "기관" in h
+        has_foreigner = has_foreigner or "외국인" in h
+        if has_institution and has_foreigner:
+            break
+    else:
+        return []
+    
+    investor_trends = []
+    # 컬럼 헤더만 찾기 (scope="col" 또는 thead 내부)
+    inv_thead = table.find("thead")
+    col_headers = []
+    if inv_thead:
+        # thead의 모든 tr에서 th 찾기
+        thead_rows = inv_thead.find_all("tr")
+        for thead_row in thead_rows:
+            col_headers.extend(thead_row.find_all("th"))
+    else:
+        # thead가 없으면 첫 번째 행의 th를 컬럼 헤더로 간주
+        first_row = table.find("tr")
+        if first_row:
+            col_headers = first_row.find_all("th")
+    
+    col_header_texts = [h.get_text(strip=True) for h in col_headers]
+    
+    # 헤더에서 정확한 컬럼 인덱스 찾기 (헤더 1회 순회)
+    # 테이블 구조: 날짜, 종가, 전일비, 등락률, 거래량, 기관(순매매량), 외국인(순매매량), 외국인(보유주수), 외국인(보유율)
+    date_idx = None
+    institution_idx = None
+    foreigner_idx = None
+    foreigner_shares_idx = None
+    foreigner_ratio_idx = None
+    # 위치 기반 fallback 후보: 각 조건을 처음 만족하는 헤더 (정확한 매칭이 없을 때만 사용)
+    any_institution_idx = None
+    any_foreigner_idx = None
+    any_foreigner_shares_idx = None
+    any_foreigner_ratio_idx = None
+    
+    # 2행 헤더 구조 처리: 첫 번째 행과 두 번째 행 모두 확인
+    for i, header in enumerate(col_header_texts):
+        is_institution = "기관" in header
+        is_foreigner = "외국인" in header
+        is_net = "순매매" in header
+        is_shares = is_foreigner and "보유" in header and "율" not in header
+        is_ratio = is_foreigner and "율" in header
+        
+        if is_institution and any_institution_idx is None:
+            any_institution_idx = i
+        if is_foreigner and is_net and any_foreigner_idx is None:
+            any_foreigner_idx = i
+        if is_shares and any_foreigner_shares_idx is None:
+            any_foreigner_shares_idx = i
+        if is_ratio and any_foreigner_ratio_idx is None:
+            any_foreigner_ratio_idx = i
+        
+        if "날짜" in header or "일자" in header or "date" in header.lower():
+            date_idx = i
+        elif is_institution and is_net:
+            institution_idx = i
+        elif is_foreigner and is_net:
+            foreigner_idx = i
+        elif is_shares:
+            foreigner_shares_idx = i
+        elif is_ratio:
+            foreigner_ratio_idx = i
+    
+    # Fallback: 헤더 텍스트가 정확히 매칭되지 않은 경우 위치 기반으로 추정
+    # 일반적인 순서: 날짜(0), 종가(1), 전일비(2), 등락률(3), 거래량(4), 기관(5), 외국인(6), 외국인보유주수(7), 외국인보유율(8)
+    header_count = len(col_header_texts)
+    if institution_idx is None and header_count > 5:
+        institution_idx = any_institution_idx
+    if foreigner_idx is None and header_count > 6:
+        foreigner_idx = any_foreigner_idx
+    if foreigner_shares_idx is None and header_count > 7:
+        foreigner_shares_idx = any_foreigner_shares_idx
+    if foreigner_ratio_idx is None and header_count > 8:
+        foreigner_ratio_idx = any_foreigner_ratio_idx
+    
+    rows = iter(table.find_all("tr"))
+    next(rows, None)  # Skip header
+    for row in rows:
+        # 행의 셀 텍스트는 한 번만 추출해서 인덱스로 사용
+        texts = [td.get_text(strip=True) for td in row.find_all("td")]
+        if len(texts) < 2:
+            continue
+        
+        # 헤더 매칭으로 정확한 컬럼 사용
+        if date_idx is not None and date_idx < len(texts):
+            date = texts[date_idx]
         else:
-            print(f"[{code}] No quarterly financial data found in main page")
+            date = texts[0]  # Fallback
         
-        # Use dictionary structure instead of list (empty dict becomes None)
-        financials = financials_dict if financials_dict else None
+        # Skip if date is empty or looks like a header
+        if not date or date in _HEADER_SKIP:
+            continue
         
-        # Only try other pages if not found in main page (to speed up)
-        # Skip - we prioritize quarterly tables from main page
+        # 날짜 형식 검증 (YYYY.MM.DD 또는 YYYY-MM-DD 형식만 허용, 종가 등 숫자 셀은 여기서 걸러짐)
+        # get_text(strip=True)라 앞뒤 공백은 이미 제거됨
+        if not _DATE_RE.match(date):
+            continue
         
-        # Investor trends (투자자별 매매동향) - parse from investor table
-        # Try main page first (already loaded) for speed
-        investor_trends = []
-        inv_tables = soup.select("table.type_2, table.tb_type1, table.type_1, table.sise")
+        # 헤더 매칭으로 기관/외국인 값 가져오기
+        institution = 0
+        foreigner = 0
+        foreigner_shares = 0
+        foreigner_ratio = 0.0
         
-        # 우선순위: summary 속성에 "외국인" 또는 "기관" 또는 "순매매"가 포함된 테이블
-        priority_tables = []
-        other_tables = []
+        if institution_idx is not None and institution_idx < len(texts):
+            institution = _to_int(texts[institution_idx])
+        elif len(texts) > 5:
+            # Fallback: 6번째 컬럼(인덱스 5)이 기관일 가능성
+            institution = _to_int(texts[5])
         
-        for table in inv_tables:
-            table_summary = table.get("summary", "")
-            caption = table.select_one("caption")
-            caption_text = caption.get_text(strip=True) if caption else ""
-            
-            # 우선순위 테이블: summary나 caption에 투자자 관련 키워드가 있는 경우
-            if any(keyword in table_summary or keyword in caption_text 
-                   for keyword in ["외국인", "기관", "순매매", "매매동향", "투자자"]):
-                priority_tables.append(table)
-            else:
-                other_tables.append(table)
+        if foreigner_idx is not None and foreigner_idx < len(texts):
+            foreigner = _to_int(texts[foreigner_idx])
+        elif len(texts) > 6:
+            # Fallback: 7번째 컬럼(인덱스 6)이 외국인 순매매량일 가능성
+            foreigner = _to_int(texts[6])
         
-        # 우선순위 테이블부터 처리
-        tables_to_check = priority_tables + other_tables
+        if foreigner_shares_idx is not None and foreigner_shares_idx < len(texts):
+            foreigner_shares = _to_int(texts[foreigner_shares_idx])
+        elif len(texts) > 7:
+            # Fallback: 8번째 컬럼(인덱스 7)이 외국인 보유주수일 가능성
+            foreigner_shares = _to_int(texts[7])
         
-        for table in tables_to_check:
-            headers = table.select("th")
-            header_texts = [h.get_text(strip=True) for h in headers]
-            has_institution = any("기관" in h or "기관투자자" in h for h in header_texts)
-            has_foreigner = any("외국인" in h or "외국인투자자" in h for h in header_texts)
-            
-            # 호가 정보 테이블 제외
-            table_summary = table.get("summary", "")
-            if "호가 정보" in table_summary or "호가정보" in table_summary:
-                continue
-            
-            if has_institution and has_foreigner:
-                # 컬럼 헤더만 찾기 (scope="col" 또는 thead 내부)
-                inv_thead = table.select_one("thead")
-                col_headers = []
-                if inv_thead:
-                    # thead의 모든 tr에서 th 찾기
-                    thead_rows = inv_thead.select("tr")
-                    for thead_row in thead_rows:
-                        col_headers.extend(thead_row.select("th[scope='col'], th"))
-                else:
-                    # thead가 없으면 첫 번째 행의 th를 컬럼 헤더로 간주
-                    first_row = table.select_one("tr")
-                    if first_row:
-                        col_headers = first_row.select("th")
-                
-                col_header_texts = [h.get_text(strip=True) for h in col_headers]
-                
-                # 헤더에서 정확한 컬럼 인덱스 찾기
-                # 테이블 구조: 날짜, 종가, 전일비, 등락률, 거래량, 기관(순매매량), 외국인(순매매량), 외국인(보유주수), 외국인(보유율)
-                date_idx = None
-                institution_idx = None
-                foreigner_idx = None
-                foreigner_shares_idx = None
-                foreigner_ratio_idx = None
-                
-                # 2행 헤더 구조 처리: 첫 번째 행과 두 번째 행 모두 확인
-                for i, header in enumerate(col_header_texts):
-                    header_lower = header.lower()
-                    if "날짜" in header or "일자" in header or "date" in header_lower:
-                        date_idx = i
-                    elif "기관" in header and "순매매" in header:
-                        institution_idx = i
-                    elif "외국인" in header and "순매매" in header:
-                        foreigner_idx = i
-                    elif "외국인" in header and ("보유주수" in header or "보유" in header) and "율" not in header:
-                        foreigner_shares_idx = i
-                    elif "외국인" in header and ("보유율" in header or "율" in header):
-                        foreigner_ratio_idx = i
-                
-                # Fallback: 헤더 텍스트가 정확히 매칭되지 않은 경우 위치 기반으로 추정
-                # 일반적인 순서: 날짜(0), 종가(1), 전일비(2), 등락률(3), 거래량(4), 기관(5), 외국인(6), 외국인보유주수(7), 외국인보유율(8)
-                if institution_idx is None and len(col_header_texts) > 5:
-                    # "기관"이 포함된 헤더 찾기
-                    for i, header in enumerate(col_header_texts):
-                        if "기관" in header and institution_idx is None:
-                            institution_idx = i
-                            break
-                
-                if foreigner_idx is None and len(col_header_texts) > 6:
-                    # "외국인"이 포함되고 "순매매"가 있는 헤더 찾기
-                    for i, header in enumerate(col_header_texts):
-                        if "외국인" in header and "순매매" in header and foreigner_idx is None:
-                            foreigner_idx = i
-                            break
-                
-                if foreigner_shares_idx is None and len(col_header_texts) > 7:
-                    # "외국인"이 포함되고 "보유주수"가 있는 헤더 찾기
-                    for i, header in enumerate(col_header_texts):
-                        if "외국인" in header and ("보유주수" in header or "보유" in header) and "율" not in header and foreigner_shares_idx is None:
-                            foreigner_shares_idx = i
-                            break
-                
-                if foreigner_ratio_idx is None and len(col_header_texts) > 8:
-                    # "외국인"이 포함되고 "보유율"이 있는 헤더 찾기
-                    for i, header in enumerate(col_header_texts):
-                        if "외국인" in header and ("보유율" in header or "율" in header) and foreigner_ratio_idx is None:
-                            foreigner_ratio_idx = i
-                            break
-                
-                rows = table.select("tr")
-                for row in rows[1:]:  # Skip header
-                    tds = row.select("td")
-                    if len(tds) < 2:
-                        continue
-                    
-                    # 헤더 매칭으로 정확한 컬럼 사용
-                    if date_idx is not None and date_idx < len(tds):
-                        date = tds[date_idx].get_text(strip=True)
-                    else:
-                        date = tds[0].get_text(strip=True)  # Fallback
-                    
-                    # Skip if date is empty or looks like a header
-                    if not date or date in ["날짜", "일자", "구분", "Date"]:
-                        continue
-                    
-                    # 날짜 형식 검증 (YYYY.MM.DD 또는 YYYY-MM-DD 형식만 허용)
-                    date_clean = date.strip() if date else ""
-                    is_valid_date = False
-                    if date_clean:
-                        # YYYY.MM.DD 또는 YYYY-MM-DD 형식 확인
-                        if re.match(r'\d{4}[\.-]\d{1,2}[\.-]\d{1,2}', date_clean):
-                            is_valid_date = True
-                        # 숫자만 있는 경우 스킵 (종가 등)
-                        elif date_clean.replace(",", "").replace(".", "").replace("-", "").isdigit():
-                            is_valid_date = False
-                    
-                    if not is_valid_date:
-                        continue
-                    
-                    # 헤더 매칭으로 기관/외국인 값 가져오기
-                    institution = 0
-                    foreigner = 0
-                    foreigner_shares = 0
-                    foreigner_ratio = 0.0
-                    
-                    if institution_idx is not None and institution_idx < len(tds):
-                        institution_text = tds[institution_idx].get_text(strip=True)
-                        institution = _to_int(institution_text)
-                    elif len(tds) > 5:
-                        # Fallback: 6번째 컬럼(인덱스 5)이 기관일 가능성
-                        institution = _to_int(tds[5].get_text(strip=True))
-                    
-                    if foreigner_idx is not None and foreigner_idx < len(tds):
-                        foreigner_text = tds[foreigner_idx].get_text(strip=True)
-                        foreigner = _to_int(foreigner_text)
-                    elif len(tds) > 6:
-                        # Fallback: 7번째 컬럼(인덱스 6)이 외국인 순매매량일 가능성
-                        foreigner = _to_int(tds[6].get_text(strip=True))
-                    
-                    if foreigner_shares_idx is not None and foreigner_shares_idx < len(tds):
-                        foreigner_shares_text = tds[foreigner_shares_idx].get_text(strip=True)
-                        foreigner_shares = _to_int(foreigner_shares_text)
-                    elif len(tds) > 7:
-                        # Fallback: 8번째 컬럼(인덱스 7)이 외국인 보유주수일 가능성
-                        foreigner_shares = _to_int(tds[7].get_text(strip=True))
-                    
-                    if foreigner_ratio_idx is not None and foreigner_ratio_idx < len(tds):
-                        foreigner_ratio_text = tds[foreigner_ratio_idx].get_text(strip=True)
-                        foreigner_ratio = _to_float(foreigner_ratio_text)
-                    elif len(tds) > 8:
-                        # Fallback: 9번째 컬럼(인덱스 8)이 외국인 보유율일 가능성
-                        foreigner_ratio = _to_float(tds[8].get_text(strip=True))
-                    
-                    investor_trends.append({
-                        "date": date_clean,
-                        "institution": institution,
-                        "foreigner": foreigner,
-                        "foreigner_shares": foreigner_shares,
-                        "foreigner_ratio": foreigner_ratio,
-                    })
-                    if len(investor_trends) >= 5:  # Recent 5 days
-                        break
-                if len(investor_trends) > 0:
-                    break
+        if foreigner_ratio_idx is not None and foreigner_ratio_idx < len(texts):
+            foreigner_ratio = _to_float(texts[foreigner_ratio_idx])
+        elif len(texts) > 8:
+            # Fallback: 9번째 컬럼(인덱스 8)이 외국인 보유율일 가능성
+            foreigner_ratio = _to_float(texts[8])
         
+        investor_trends.append(InvestorTrend(
+            date=date,
+            institution=institution,
+            foreigner=foreigner,
+            foreigner_shares=foreigner_shares,
+            foreigner_ratio=foreigner_ratio,
+        ))
+        if len(investor_trends) >= 5:  # Recent 5 days
+            break
+    return investor_trends
+
+
+# frgn.naver only needs the investor tables themselves
+_INV_TABLE_STRAINER = SoupStrainer("table", class_=["type_2", "tb_type1", "sise", "type_1"])
+
+
+def _parse_investor_page(inv_html: str) -> List[InvestorTrend]:
+    """Parse investor trends from item/frgn.naver (fallback when the main page has none)."""
+    investor_trends = []
+    # 기관/외국인 헤더가 없는 페이지는 파싱 없이 종료
+    if "기관" not in inv_html or "외국인" not in inv_html:
+        return investor_trends
+    # 투자자 표만 트리로 만듦 (페이지의 나머지 DOM은 생성하지 않음)
+    inv_soup = BeautifulSoup(inv_html, "lxml", parse_only=_INV_TABLE_STRAINER)
+    inv_tables = inv_soup.select("table.type_2, table.tb_type1, table.sise, table.type_1")
+    for table in inv_tables:
+        investor_trends = _parse_investor_table(table)
         if investor_trends:
-            print(f"[{code}] Found {len(investor_trends)} investor trend records")
-        else:
-            print(f"[{code}] No investor trend data found in main page")
-        
-        # Only try other pages if not found in main page (to speed up)
+            break
+    return investor_trends
+
+
+async def fetch_stock_detail(client: httpx.AsyncClient, code: str) -> Optional[StockDetail]:
+    """
+    Fetch detailed information for a specific stock from Naver Finance.
+    Includes: pivot points, news, financials, investor trends.
+    """
+    try:
+        # Main stock page
+        html = await _get(client, f"https://finance.naver.com/item/main.naver?code={code}")
+        loop = asyncio.get_running_loop()
+        # HTML 파싱은 CPU 작업 → 워커 스레드에서 실행 (파싱 중에도 이벤트 루프는 다른 요청 처리)
+        detail = await loop.run_in_executor(None, _parse_detail_html, html, code)
+        if detail is None:
+            return None
+
+        # If no news found, use the news page
+        async def fill_news():
+            try:
+                news_html = await _get(client, f"https://finance.naver.com/item/news.naver?code={code}")
+                detail.news = await loop.run_in_executor(None, _parse_news_page, news_html)
+            except Exception as e:
+                log.warning("Failed to fetch news page for %s: %s", code, e)
+                # Continue without news - don't block the response
+
         # 투자자별 매매동향이 없으면 외국인 투자 페이지에서 가져오기
-        if not investor_trends:
-            investor_pages = [
-                f"https://finance.naver.com/item/frgn.naver?code={code}",
-            ]
-            for inv_url in investor_pages:
-                try:
-                    inv_html = await _get(client, inv_url)
-                    inv_soup = BeautifulSoup(inv_html, "html.parser")
-                    inv_tables = inv_soup.select("table.type_2, table.tb_type1, table.sise, table.type_1")
-                    for table in inv_tables:
-                        headers = table.select("th")
-                        header_texts = [h.get_text(strip=True) for h in headers]
-                        has_institution = any("기관" in h for h in header_texts)
-                        has_foreigner = any("외국인" in h for h in header_texts)
-                        
-                        if has_institution and has_foreigner:
-                            # 컬럼 헤더만 찾기 (scope="col" 또는 thead 내부)
-                            inv_thead = table.select_one("thead")
-                            col_headers = []
-                            if inv_thead:
-                                # thead의 모든 tr에서 th 찾기
-                                thead_rows = inv_thead.select("tr")
-                                for thead_row in thead_rows:
-                                    col_headers.extend(thead_row.select("th[scope='col'], th"))
-                            else:
-                                first_row = table.select_one("tr")
-                                if first_row:
-                                    col_headers = first_row.select("th")
-                            
-                            col_header_texts = [h.get_text(strip=True) for h in col_headers]
-                            
-                            # 헤더에서 정확한 컬럼 인덱스 찾기
-                            date_idx = None
-                            institution_idx = None
-                            foreigner_idx = None
-                            foreigner_shares_idx = None
-                            foreigner_ratio_idx = None
-                            
-                            for i, header in enumerate(col_header_texts):
-                                header_lower = header.lower()
-                                if "날짜" in header or "일자" in header or "date" in header_lower:
-                                    date_idx = i
-                                elif "기관" in header and "순매매" in header:
-                                    institution_idx = i
-                                elif "외국인" in header and "순매매" in header:
-                                    foreigner_idx = i
-                                elif "외국인" in header and ("보유주수" in header or "보유" in header) and "율" not in header:
-                                    foreigner_shares_idx = i
-                                elif "외국인" in header and ("보유율" in header or "율" in header):
-                                    foreigner_ratio_idx = i
-                            
-                            # Fallback: 위치 기반 추정
-                            if institution_idx is None and len(col_header_texts) > 5:
-                                for i, header in enumerate(col_header_texts):
-                                    if "기관" in header and institution_idx is None:
-                                        institution_idx = i
-                                        break
-                            
-                            if foreigner_idx is None and len(col_header_texts) > 6:
-                                for i, header in enumerate(col_header_texts):
-                                    if "외국인" in header and "순매매" in header and foreigner_idx is None:
-                                        foreigner_idx = i
-                                        break
-                            
-                            if foreigner_shares_idx is None and len(col_header_texts) > 7:
-                                for i, header in enumerate(col_header_texts):
-                                    if "외국인" in header and ("보유주수" in header or "보유" in header) and "율" not in header and foreigner_shares_idx is None:
-                                        foreigner_shares_idx = i
-                                        break
-                            
-                            if foreigner_ratio_idx is None and len(col_header_texts) > 8:
-                                for i, header in enumerate(col_header_texts):
-                                    if "외국인" in header and ("보유율" in header or "율" in header) and foreigner_ratio_idx is None:
-                                        foreigner_ratio_idx = i
-                                        break
-                            
-                            rows = table.select("tr")
-                            for row in rows[1:]:  # Skip header
-                                tds = row.select("td")
-                                if len(tds) < 2:
-                                    continue
-                                
-                                # 헤더 매칭으로 정확한 컬럼 사용
-                                if date_idx is not None and date_idx < len(tds):
-                                    date = tds[date_idx].get_text(strip=True)
-                                else:
-                                    date = tds[0].get_text(strip=True)  # Fallback
-                                
-                                # Skip if date is empty or looks like a header
-                                if not date or date in ["날짜", "일자", "구분", "Date"]:
-                                    continue
-                                
-                                # 날짜 형식 검증 (YYYY.MM.DD 또는 YYYY-MM-DD 형식만 허용)
-                                date_clean = date.strip() if date else ""
-                                is_valid_date = False
-                                if date_clean:
-                                    # YYYY.MM.DD 또는 YYYY-MM-DD 형식 확인
-                                    if re.match(r'\d{4}[\.-]\d{1,2}[\.-]\d{1,2}', date_clean):
-                                        is_valid_date = True
-                                    # 숫자만 있는 경우 스킵 (종가 등)
-                                    elif date_clean.replace(",", "").replace(".", "").replace("-", "").isdigit():
-                                        is_valid_date = False
-                                
-                                if not is_valid_date:
-                                    continue
-                                
-                                institution = 0
-                                foreigner = 0
-                                foreigner_shares = 0
-                                foreigner_ratio = 0.0
-                                
-                                if institution_idx is not None and institution_idx < len(tds):
-                                    institution_text = tds[institution_idx].get_text(strip=True)
-                                    institution = _to_int(institution_text)
-                                elif len(tds) > 5:
-                                    institution = _to_int(tds[5].get_text(strip=True))
-                                
-                                if foreigner_idx is not None and foreigner_idx < len(tds):
-                                    foreigner_text = tds[foreigner_idx].get_text(strip=True)
-                                    foreigner = _to_int(foreigner_text)
-                                elif len(tds) > 6:
-                                    foreigner = _to_int(tds[6].get_text(strip=True))
-                                
-                                if foreigner_shares_idx is not None and foreigner_shares_idx < len(tds):
-                                    foreigner_shares_text = tds[foreigner_shares_idx].get_text(strip=True)
-                                    foreigner_shares = _to_int(foreigner_shares_text)
-                                elif len(tds) > 7:
-                                    foreigner_shares = _to_int(tds[7].get_text(strip=True))
-                                
-                                if foreigner_ratio_idx is not None and foreigner_ratio_idx < len(tds):
-                                    foreigner_ratio_text = tds[foreigner_ratio_idx].get_text(strip=True)
-                                    foreigner_ratio = _to_float(foreigner_ratio_text)
-                                elif len(tds) > 8:
-                                    foreigner_ratio = _to_float(tds[8].get_text(strip=True))
-                                
-                                investor_trends.append({
-                                    "date": date_clean,
-                                    "institution": institution,
-                                    "foreigner": foreigner,
-                                    "foreigner_shares": foreigner_shares,
-                                    "foreigner_ratio": foreigner_ratio,
-                                })
-                                if len(investor_trends) >= 5:  # Recent 5 days
-                                    break
-                            if len(investor_trends) > 0:
-                                break
-                            if len(investor_trends) > 0:
-                                break
-                    if len(investor_trends) > 0:
-                        break
-                except Exception as e:
-                    print(f"Warning: Failed to fetch investor page {inv_url} for {code}: {e}")
-                    continue
-        
-        return StockDetail(
-            code=code,
-            name=name,
-            price=price,
-            change=change,
-            change_pct=change_pct,
-            volume=volume,
-            trade_value=trade_value,
-            market=market,
-            pivot=pivot_data["pivot"] if pivot_data else None,
-            r1=pivot_data["r1"] if pivot_data else None,
-            r2=pivot_data["r2"] if pivot_data else None,
-            s1=pivot_data["s1"] if pivot_data else None,
-            s2=pivot_data["s2"] if pivot_data else None,
-            prev_high=prev_high,
-            prev_low=prev_low,
-            prev_close=prev_close,
-            news=news if news else [],
-            financials=financials,
-            investor_trends=investor_trends if investor_trends else None,
-        )
-    except Exception as e:
-        print(f"Error fetching stock detail for {code}: {e}")
-        return None
+        async def fill_investor_trends():
+            inv_url = f"https://finance.naver.com/item/frgn.naver?code={code}"
+            try:
+                inv_html = await _get(client, inv_url)
+                trends = await loop.run_in_executor(None, _parse_investor_page, inv_html)
+                if trends:
+                    detail.investor_trends = trends
+            except Exception as e:
+                log.warning("Failed to fetch investor page %s for %s: %s", inv_url, code, e)
 
+        # Only try other pages if not found in main page (to speed up)
+        # 메인 페이지에서 빠진 항목만 요청, 둘 다 빠졌으면 두 페이지를 동시에 요청
+        fallbacks = []
+        if not detail.news:
+            fallbacks.append(fill_news())
+        if not detail.investor_trends:
+            fallbacks.append(fill_investor_trends())
+        if fallbacks:
+            await asyncio.gather(*fallbacks)
 
+        return detail
+    except Exception as e:
+        log.error("Error fetching stock detail for %s: %s", code, e)
+        return None
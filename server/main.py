@@ -1,18 +1,17 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import os
 import time
 from pathlib import Path
 from typing import Set, Optional
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
-import httpx
+import orjson
 
-from server.data_sources.naver_finance import build_snapshot, fetch_stock_detail, RisingStock, ai_opinion_for
+from server.data_sources.naver_finance import build_snapshot
 
 
 # --------------------------------------------------
@@ -24,6 +23,7 @@ MOBILE_DIR = APP_ROOT / "mobile"
 OWNER_NAME = os.environ.get("OWNER_NAME", "김성훈")
 APP_TOKEN = os.environ.get("APP_TOKEN", "").strip()
 AUTO_REFRESH_SEC = float(os.environ.get("AUTO_REFRESH_SEC", "60").strip() or "60")
+_OWNER_JSON = orjson.dumps(OWNER_NAME)
 
 
 # --------------------------------------------------
@@ -43,6 +43,12 @@ async def startup_event():
     asyncio.create_task(cache_loop())
     print("[SERVER] Cache worker started")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    from server.cache_worker import close_client, stop_logging
+    await close_client()
+    stop_logging()
+
 # ✅ 루트 경로: /app/로 리다이렉트
 @app.get("/")
 async def root():
@@ -72,46 +78,64 @@ _inflight_refresh: Optional[asyncio.Task] = None
 # --------------------------------------------------
 @app.get("/health")
 def health() -> JSONResponse:
-    from server.cache import GLOBAL_CACHE, CACHE_LOCK
-    with CACHE_LOCK:
-        return JSONResponse({
-            "ok": True,
-            "ts": int(time.time()),
-            "owner": OWNER_NAME,
-            "cache_status": GLOBAL_CACHE["status"],
-            "updated_at": GLOBAL_CACHE["updated_at"],
-            "snapshot_ready": GLOBAL_CACHE["snapshot"] is not None,
-            "detail_count": len(GLOBAL_CACHE["detail"]),
-        })
+    from server import cache
+    state = cache.STATE
+    return JSONResponse({
+        "ok": True,
+        "ts": int(time.time()),
+        "owner": OWNER_NAME,
+        "cache_status": state.status,
+        "updated_at": state.updated_at,
+        "snapshot_ready": state.snapshot is not None,
+        "detail_count": len(state.detail),
+        "last_error": state.last_error,
+    })
 
 
 # --------------------------------------------------
 # Snapshot API
 # --------------------------------------------------
+def _cache_headers(state, code: Optional[str] = None) -> dict:
+    """
+    Age / X-Cache-Status so clients can tell last-good (stale) data apart.
+    With `code`, Age counts from that detail's fetch and a failed refetch marks it stale.
+    """
+    stale = state.last_error is not None or code in state.stale_details
+    headers = {"X-Cache-Status": "stale" if stale else "fresh"}
+    fetched = state.fetched_at.get(code) if code is not None else state.updated_at_mono
+    if fetched is not None:
+        # monotonic 기준 → NTP 보정으로 벽시계가 뒤로 가도 Age가 꼬이지 않음
+        headers["Age"] = str(max(0, int(time.monotonic() - fetched)))
+    return headers
+
+
 @app.get("/snapshot")
-async def snapshot(request: Request) -> JSONResponse:
+async def snapshot(request: Request) -> Response:
     token = (request.headers.get("X-App-Token") or "").strip()
     if APP_TOKEN and token != APP_TOKEN:
         return JSONResponse({"ok": False, "error": "unauthorized"}, status_code=401)
 
-    from server.cache import GLOBAL_CACHE, CACHE_LOCK
-    with CACHE_LOCK:
-        if GLOBAL_CACHE["snapshot"] is None:
-            return JSONResponse({
-                "ok": False,
-                "status": "warming_up",
-                "message": "데이터 준비 중 (최초 1회)",
-                "ts": int(time.time()),
-                "owner": OWNER_NAME,
-                "data": None,
-            })
-        # Wrap snapshot in expected format
+    from server import cache
+    state = cache.STATE
+    if state.snapshot_json is None:
         return JSONResponse({
-            "ok": True,
-            "data": GLOBAL_CACHE["snapshot"],
+            "ok": False,
+            "status": "warming_up",
+            "message": "데이터 준비 중 (최초 1회)",
             "ts": int(time.time()),
             "owner": OWNER_NAME,
+            "data": None,
         })
+    # Wrap pre-serialized snapshot in expected format
+    return Response(
+        content=(
+            b'{"ok":true,"data":' + state.snapshot_json
+            + b',"ts":' + str(int(time.time())).encode()
+            + b',"owner":' + _OWNER_JSON + b'}'
+        ),
+        media_type="application/json",
+        headers=_cache_headers(state),
+    )
 
 
 @app.post("/refresh")
@@ -128,7 +152,7 @@ async def refresh(request: Request) -> JSONResponse:
 # Stock Detail
 # --------------------------------------------------
 @app.get("/stock/{code}")
-async def stock_detail(code: str, request: Request) -> JSONResponse:
+async def stock_detail(code: str, request: Request) -> Response:
     # 한국 주식 코드는 일반주 6자리, 우선주 5자리 또는 6자리
     if not code.isdigit() or len(code) < 5 or len(code) > 6:
         return JSONResponse({"ok": False, "error": "invalid stock code"}, status_code=400)
@@ -137,11 +161,11 @@ async def stock_detail(code: str, request: Request) -> JSONResponse:
     if APP_TOKEN and token != APP_TOKEN:
         return JSONResponse({"ok": False, "error": "unauthorized"}, status_code=401)
 
-    from server.cache import GLOBAL_CACHE, CACHE_LOCK
-    with CACHE_LOCK:
-        detail = GLOBAL_CACHE["detail"].get(code)
+    from server import cache
+    state = cache.STATE
+    body = state.detail_json.get(code)
 
-    if detail is None:
+    if body is None:
         return JSONResponse({
             "ok": False,
             "status": "not_ready",
@@ -149,64 +173,12 @@ async def stock_detail(code: str, request: Request) -> JSONResponse:
             "error": "stock_not_ready"
         }, status_code=404)
 
-    # Find corresponding stock from snapshot for signals/ai_opinion
-    with CACHE_LOCK:
-        snapshot = GLOBAL_CACHE["snapshot"]
-
-    rising_stock = None
-    if snapshot and snapshot.get("stocks"):
-        for s in snapshot.get("stocks", []):
-            if s.get("code") == code:
-                rising_stock = RisingStock(
-                    code=s["code"],
-                    name=s["name"],
-                    price=s["price"],
-                    change=s.get("change", 0),
-                    change_pct=s.get("change_pct", 0.0),
-                    volume=s.get("volume", 0),
-                    trade_value=s.get("trade_value", 0),
-                    market=s.get("market", "KOSPI"),
-                )
-                break
-
-    if not rising_stock:
-        rising_stock = RisingStock(
-            code=detail.code,
-            name=detail.name,
-            price=detail.price,
-            change=detail.change,
-            change_pct=detail.change_pct,
-            volume=detail.volume,
-            trade_value=detail.trade_value,
-            market=detail.market,
-        )
-
-    ai_opinion = ai_opinion_for(rising_stock, detail)
-
-    return JSONResponse({
-        "ok": True,
-        "data": {
-            "code": detail.code,
-            "name": detail.name,
-            "price": detail.price,
-            "change": detail.change,
-            "change_pct": detail.change_pct,
-            "volume": detail.volume,
-            "trade_value": detail.trade_value,
-            "market": detail.market,
-            "pivot": {
-                "pivot": detail.pivot,
-                "r1": detail.r1,
-                "r2": detail.r2,
-                "s1": detail.s1,
-                "s2": detail.s2,
-            } if detail.pivot else None,
-            "news": detail.news or [],
-            "financials": detail.financials or [],
-            "investor_trends": detail.investor_trends or [],
-            "ai_opinion": ai_opinion,
-        }
-    })
+    # 사이클마다 미리 직렬화된 본문 사용 (요청당 JSON 인코딩 없음)
+    return Response(
+        content=b'{"ok":true,"data":' + body + b'}',
+        media_type="application/json",
+        headers=_cache_headers(state, code),
+    )
 
 
 # --------------------------------------------------
@@ -226,7 +198,8 @@ class Hub:
             self._clients.discard(ws)
 
     async def broadcast(self, payload: dict):
-        msg = json.dumps(payload, ensure_ascii=False)
+        # 브로드캐스트당 1회만 인코딩 (모든 클라이언트가 같은 문자열 공유)
+        msg = orjson.dumps(payload).decode()
         async with self._lock:
             clients = list(self._clients)
 
@@ -251,7 +224,7 @@ async def ws_endpoint(ws: WebSocket):
     await hub.add(ws)
 
     try:
-        await ws.send_text(json.dumps({"type": "hello", "owner": OWNER_NAME}, ensure_ascii=False))
+        await ws.send_text(orjson.dumps({"type": "hello", "owner": OWNER_NAME}).decode())
         while True:
             await ws.receive_text()
     except WebSocketDisconnect:
@@ -266,14 +239,17 @@ async def ws_endpoint(ws: WebSocket):
 @app.on_event("startup")
 async def startup_event():
 
-    async def do_refresh(seq: int) -> dict:
+    async def do_refresh(seq: int, force: bool = False) -> dict:
         global _inflight_refresh
 
         if _inflight_refresh and not _inflight_refresh.done():
             return await _inflight_refresh
 
         async def work():
-            data = await build_snapshot()
+            # cache_worker와 같은 공유 클라이언트 사용 (HTTP/2 연결/keep-alive 재사용)
+            from server.cache_worker import get_client
+            # POST /refresh 요청이면 스냅샷 TTL 캐시를 건너뛰고 새로 조회
+            data = await build_snapshot(get_client(), force=force)
             return {
                 "type": "snapshot",
                 "seq": seq,
@@ -287,10 +263,11 @@ async def startup_event():
 
     async def refresh_loop():
         i = 0
+        forced = False
         while True:
             i += 1
             try:
-                payload = await do_refresh(i)
+                payload = await do_refresh(i, force=forced)
             except Exception as e:
                 payload = {
                     "type": "snapshot",
@@ -309,7 +286,8 @@ async def startup_event():
             try:
                 _refresh_now.clear()
                 await asyncio.wait_for(_refresh_now.wait(), timeout=AUTO_REFRESH_SEC)
+                forced = True
             except asyncio.TimeoutError:
-                pass
+                forced = False
 
     asyncio.create_task(refresh_loop())